@@ -1,19 +1,80 @@
+from array import array
 import time
 
 from config import Settings
+from runtime import ThreadSafeFlag
+
+
+def days_from_civil(year, month, day):
+    # days since 1970-01-01, see http://howardhinnant.github.io/date_algorithms.html
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def civil_from_days(days):
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    year = yoe + era * 400 + (1 if month <= 2 else 0)
+    return year, month, day
+
+
+def bisect_right(values, value):
+    # index after the last entry <= value in the sorted sequence values
+    lo = 0
+    hi = len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if value < values[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
 
 class AlarmHandler:  # *****************************************************************************************************************
 
-    def __init__(self, rtc):
+    def __init__(self, rtc, timers):
 
         self.rtc = rtc
 
         self._alarm_next_rtcdt = None
+        self._alarm_next_s = None  # seconds since 1970-01-01
         self._enabled = True
         self._alarm_count = 0
-        self._snooze_alarm_ticks_ms = 0  # Ticks when the snooze alarm is raised
 
-        self._alarms = Settings.alarms
+        # the snooze timer raises the alarm, the auto-stop timer starts with it
+        self._timers = timers
+        self._snooze_timer = timers.add(self._snooze_expired)
+        self._auto_stop_timer = timers.add()
+        self._alarm_reached = False
+        self.flag = ThreadSafeFlag()  # set when the alarm or snooze time is reached
+
+        self._alarms = list(Settings.alarms)
+        try:
+            self._alarms_once = list(Settings.alarms_once)
+        except AttributeError:
+            self._alarms_once = []
+        try:
+            self._alarm_skip_dates = list(Settings.alarm_skip_dates)
+        except AttributeError:
+            self._alarm_skip_dates = []
+
+        # compiled schedule, rebuilt by compile() whenever the alarms change
+        self._compiled = False
+        self._weekly = None  # sorted minutes since Monday 0:00
+        self._once = None  # sorted minutes since 1970-01-01
+        self._skip_days = None  # sorted days since 1970-01-01
 
         # rtc format:
         #  0     1      2    3    4     5       6       7
@@ -29,28 +90,36 @@ class AlarmHandler:  # *********************************************************
         else:
             msec_diff = seconds_now * 1000
 
-        self._snooze_alarm_ticks_ms = time.ticks_ms() + Settings.snooze_time_m * \
-            60000 + msec_diff
+        self._alarm_reached = False
+        self._timers.stop(self._auto_stop_timer)
+        self._timers.start(self._snooze_timer, Settings.snooze_time_m * 60000 + msec_diff)
         self._alarm_count += 1
         self.set_alarm_next_rtcdt()
 
     def snooze_first(self):
-        self._snooze_alarm_ticks_ms = time.ticks_ms()
+        self._timers.start(self._snooze_timer, 0)
         self.set_alarm_next_rtcdt()
 
     def snooze_stop(self):
-        self._snooze_alarm_ticks_ms = 0  # = disabled
+        self._alarm_reached = False
+        self._timers.stop(self._snooze_timer)
+        self._timers.stop(self._auto_stop_timer)
         self.set_alarm_next_rtcdt()
 
+    def _snooze_expired(self):
+        self._alarm_reached = True
+        self._timers.start(self._auto_stop_timer, 60000 * Settings.alarm_auto_stop_m)
+        self.flag.set()
+
     def get_alarm_reached(self):
         # Returns True if alarm or snooze time is reached
-        return time.ticks_ms() > self._snooze_alarm_ticks_ms > 0
+        return self._alarm_reached
 
     alarm_reached = property(get_alarm_reached)
 
     def get_alarm_auto_stop_reached(self):
-        # Returns True if alarm or snooze time is reached
-        return time.ticks_ms() > self._snooze_alarm_ticks_ms + 60000 * Settings.alarm_auto_stop_m > 0
+        # Returns True if the alarm has been ringing for alarm_auto_stop_m
+        return self._alarm_reached and not self._timers.active(self._auto_stop_timer)
 
     alarm_auto_stop_reached = property(get_alarm_auto_stop_reached)
 
@@ -65,19 +134,9 @@ class AlarmHandler:  # *********************************************************
 
     enabled = property(_get_enabled, _set_enabled)
 
-    def alarm_remaining_seconds(self, alarm_rtcdt):
-        now_rtcdt = self.rtc.datetime()
-        diff_dow = self._diff_dow(now_rtcdt, alarm_rtcdt)
-
-        ret = diff_dow * 86400 + \
-            self.midnight_elapsed_seconds(
-                alarm_rtcdt) - self.midnight_elapsed_seconds(now_rtcdt)
-
-        return ret
-
     def alarm_next_remaining_seconds(self):
-        if self._enabled:
-            ret = self.alarm_remaining_seconds(self._alarm_next_rtcdt)
+        if self._enabled and self._alarm_next_s is not None:
+            ret = self._alarm_next_s - self.rtcdt_seconds(self.rtc.datetime())
         else:
             ret = 999999
 
@@ -93,28 +152,83 @@ class AlarmHandler:  # *********************************************************
         ret = rtcdt[6] + rtcdt[5]*60 + rtcdt[4]*3600
         return ret
 
-    def set_alarm_next_rtcdt(self):
-        now_rtcdt = self.rtc.datetime()
-        diff_dow_min = 8  # init dummy value
-        for alarm in self._alarms:
-            alarm_rtcdt = [-1, -1, -1, alarm[0], alarm[1],
-                           alarm[2], 0, 0]  # convert to pseudo RTC datetime
-
-            diff_dow = self._diff_dow(now_rtcdt, alarm_rtcdt)
-            # if the next alarm is today, then we have to check whether it is elapsed already
-            if (diff_dow > 0 or (diff_dow == 0 and self.midnight_elapsed_seconds(alarm_rtcdt) > self.midnight_elapsed_seconds(now_rtcdt))) \
-                    and diff_dow < diff_dow_min:
-                self._alarm_next_rtcdt = alarm_rtcdt
-                diff_dow_min = diff_dow
+    def rtcdt_seconds(self, rtcdt):
+        return days_from_civil(rtcdt[0], rtcdt[1], rtcdt[2]) * 86400 + self.midnight_elapsed_seconds(rtcdt)
+
+    def set_alarms(self, alarms=None, alarms_once=None, skip_dates=None):
+        # Replaces parts of the schedule, the next alarm is recomputed
+        if alarms is not None:
+            self._alarms = list(alarms)
+        if alarms_once is not None:
+            self._alarms_once = list(alarms_once)
+        if skip_dates is not None:
+            self._alarm_skip_dates = list(skip_dates)
+        self._compiled = False
+        self.set_alarm_next_rtcdt()
 
-        print("alarm_next_rtcdt=" + str(self._alarm_next_rtcdt))
-        return self._alarm_next_rtcdt
+    def add_alarm_once(self, year, month, day, hour, minute):
+        self._alarms_once.append((year, month, day, hour, minute))
+        self._compiled = False
+        self.set_alarm_next_rtcdt()
 
-    def _diff_dow(self, val1, val2):
+    def add_skip_date(self, year, month, day):
+        self._alarm_skip_dates.append((year, month, day))
+        self._compiled = False
+        self.set_alarm_next_rtcdt()
 
-        if val1[3] <= val2[3]:
-            ret = val2[3]-val1[3]
-        else:
-            ret = val2[3] + 7-val1[3]
+    def compile(self):
+        self._weekly = array('l', sorted(
+            [alarm[0] * 1440 + alarm[1] * 60 + alarm[2] for alarm in self._alarms]))
+        self._once = array('l', sorted(
+            [days_from_civil(a[0], a[1], a[2]) * 1440 + a[3] * 60 + a[4] for a in self._alarms_once]))
+        self._skip_days = array('l', sorted(
+            [days_from_civil(d[0], d[1], d[2]) for d in self._alarm_skip_dates]))
+        self._compiled = True
+
+    def _skipped(self, days):
+        i = bisect_right(self._skip_days, days)
+        return i > 0 and self._skip_days[i - 1] == days
+
+    def alarm_next(self, rtcdt):
+        # Returns the minutes since 1970-01-01 of the first alarm after rtcdt, or None.
+        # Weekly alarms on a skip date are left out, dated alarms always ring.
+        if not self._compiled:
+            self.compile()
+
+        days = days_from_civil(rtcdt[0], rtcdt[1], rtcdt[2])
+        minute = rtcdt[4] * 60 + rtcdt[5]
+        ret = None
+
+        i = bisect_right(self._once, days * 1440 + minute)
+        if i < len(self._once):
+            ret = self._once[i]
+
+        count = len(self._weekly)
+        if count > 0:
+            week_days = days - (days + 3) % 7  # the Monday of this week, 1970-01-01 was a Thursday
+            i = bisect_right(self._weekly, (days - week_days) * 1440 + minute)
+            for n in range(i, i + count * (len(self._skip_days) + 1)):
+                alarm = week_days * 1440 + n // count * 10080 + self._weekly[n % count]
+                if ret is not None and alarm >= ret:
+                    break
+                if not self._skipped(alarm // 1440):
+                    ret = alarm
+                    break
 
         return ret
+
+    def set_alarm_next_rtcdt(self):
+        alarm = self.alarm_next(self.rtc.datetime())
+
+        if alarm is None:
+            self._alarm_next_s = None
+            self._alarm_next_rtcdt = None
+        else:
+            self._alarm_next_s = alarm * 60
+            days = alarm // 1440
+            year, month, day = civil_from_days(days)
+            self._alarm_next_rtcdt = (year, month, day, (days + 3) % 7,
+                                      alarm % 1440 // 60, alarm % 60, 0, 0)
+
+        print("alarm_next_rtcdt=" + str(self._alarm_next_rtcdt))
+        return self._alarm_next_rtcdt
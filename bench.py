@@ -0,0 +1,337 @@
+from machine import RTC
+import gc
+import io
+import json
+import micropython
+import time
+
+from alarmhandler import AlarmHandler
+from display import DisplayHandler, Ticker
+from events import EventQueue
+import motion
+from timerwheel import TimerWheel
+import timesync
+
+# Benchmarks for the Pico W. Copy this file to the device and run e.g.
+#   import bench
+#   bench.render()
+
+
+def _heap_used():
+    try:
+        return gc.mem_alloc()
+    except AttributeError:  # CPython
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _render_frames(hdisp, frames, show):
+    start = time.ticks_us()
+    for frame in range(0, frames):
+        hdisp.clear()
+        hdisp.draw_info()
+        hdisp.draw_time_sync_failed()
+        for wheel in hdisp.wheels:
+            wheel.draw_pos(wheel._pos + 1)
+        if show:
+            hdisp.show()
+    return time.ticks_diff(time.ticks_us(), start)
+
+
+def _print_fps(name, frames, us):
+    print(name + ": " + str(us // frames) + " us/frame, " +
+          str(frames * 1000000 // max(us, 1)) + " frames/s")
+
+
+def render(frames=200, show=False):
+    # Compares the bitplane renderer with the per-pixel renderer
+    hdisp = DisplayHandler()
+    bitplane = hdisp.bitplane
+
+    hdisp.bitplane = None
+    us_pixels = _render_frames(hdisp, frames, show)
+    _print_fps("pixels  ", frames, us_pixels)
+
+    hdisp.bitplane = bitplane
+    us_bitplane = _render_frames(hdisp, frames, show)
+    _print_fps("bitplane", frames, us_bitplane)
+
+    print("speedup: x" + str(us_pixels * 10 // max(us_bitplane, 1) / 10))
+    return us_pixels, us_bitplane
+
+
+def core1(frames=200):
+    # Time core 0 spends per frame when it also sends the frame vs. when core 1 does
+    hdisp = DisplayHandler()
+    renderer = hdisp.renderer
+
+    hdisp.renderer = None
+    us_core0 = _render_frames(hdisp, frames, True)
+    _print_fps("core 0", frames, us_core0)
+    if renderer is None:
+        print("no _thread, frames are always sent from core 0")
+        return us_core0, None
+
+    hdisp.renderer = renderer
+    hdisp.invalidate()
+    renderer.reset()
+    us_core1 = _render_frames(hdisp, frames, True)
+    hdisp.flush()
+    _print_fps("core 1", frames, us_core1)
+    print("submits waiting for core 1: " + str(renderer.waits))
+    return us_core0, us_core1
+
+
+_GEOMETRIES = ((4, 1, {'clock': ('HH:MM',)}),
+               (8, 1, {'clock': ('HH:MM:SS',)}),
+               (16, 2, {'clock': ('HH:MM:SS', "WW DD TT'RR")}))
+
+
+def geometry(frames=100, geometries=_GEOMETRIES):
+    # Time per frame, drawing all wheels and sending it from this core, for growing displays
+    for modules, rows, layout in geometries:
+        hdisp = DisplayHandler(modules, rows, layout)
+        hdisp.renderer = None
+        us = _render_frames(hdisp, frames, True)
+        print(str(modules) + " modules, " + str(hdisp.index_count) + " wheels: " + str(us // frames) +
+              " us/frame, " + str(us // frames // modules) + " us/module")
+
+
+def spi(baudrates=(1000000, 2500000, 5000000, 10000000), frames=100):
+    # Time per full frame (all rows of all modules) at different SPI baud rates
+    hdisp = DisplayHandler()
+    hdisp.renderer = None
+    disp = hdisp.disp
+    for baudrate in baudrates:
+        disp.spi.init(baudrate=baudrate)
+        start = time.ticks_us()
+        for frame in range(0, frames):
+            disp.invalidate()
+            disp.show()
+        us = time.ticks_diff(time.ticks_us(), start)
+        print(str(baudrate // 1000) + " kHz: " + str(us // frames) + " us/frame (" +
+              str(16 * disp.num) + " bytes)")
+
+
+def transport(moves=([1, 2, 1, 3, 4], [1, 2, 1, 3, 5], [1, 2, 1, 4, 0], [2, 0, 1, 0, 0])):
+    # Counts the SPI bytes the delta transport saves during clock transitions
+    hdisp = DisplayHandler()
+    frames = []
+    show = hdisp.show
+
+    def counting_show():
+        show()
+        hdisp.flush()  # bytes_saved is set by core 1
+        frames.append(hdisp.disp.bytes_saved)
+
+    hdisp.show = counting_show
+    hdisp.pacer.period_ms = 0
+
+    for chars in moves:
+        hdisp.wheels_move_to(chars, show_alarm_enabled=True, show_time_sync_failed=False)
+
+    full = len(frames) * 16 * hdisp.disp.num
+    saved = sum(frames)
+    print("frames: " + str(len(frames)) + ", SPI bytes: " + str(full - saved) + " of " + str(full) +
+          ", saved per frame: " + str(saved // len(frames)))
+    return saved, full
+
+
+def _frames_list(wheel, char, direction):
+    # The list based timeline Wheel used before, kept as a reference
+    frames = []
+    pos = wheel._pos
+    if wheel.char == char:
+        return frames
+    for frame in range(0, (4-wheel.index)*12):
+        frames.append(pos)
+    for sign in motion._START:
+        pos = (pos + sign*direction) % wheel._pos_count
+        frames.append(pos)
+    while True:
+        pos = (pos + direction) % wheel._pos_count
+        frames.append(pos)
+        if wheel.char_at(pos) == char and pos % wheel._char_height == 0:
+            break
+    for sign in motion._STOP:
+        pos = (pos + sign*direction) % wheel._pos_count
+        frames.append(pos)
+    return frames
+
+
+def timeline(chars=(1, 5, 9)):
+    # Heap allocated per wheel transition: list timeline vs. lazy timeline
+    hdisp = DisplayHandler()
+    wheel = hdisp.wheels[0]
+    for char in chars:
+        gc.collect()
+        gc.disable()
+        before = _heap_used()
+        frames = _frames_list(wheel, char, -1)
+        used_list = _heap_used() - before
+
+        before = _heap_used()
+        wheel.frame_add_to_char(char, -1)
+        used_lazy = _heap_used() - before
+        gc.enable()
+
+        print("0 -> " + str(char) + ": " + str(len(frames)) + " frames, list: " +
+              str(used_list) + " bytes, lazy: " + str(used_lazy) + " bytes")
+        wheel.frames_reset()
+        frames = None
+
+
+def trajectories(distances=(9, 27, 81), curves=('classic', 'ease', 'spring'), lookups=100):
+    # Frames per move and time to compute a trajectory vs. to look it up in the cache
+    for curve in curves:
+        cache = motion.Trajectories(curve)
+        for distance in distances:
+            start = time.ticks_us()
+            trajectory = cache.get(distance)
+            us_compute = time.ticks_diff(time.ticks_us(), start)
+            start = time.ticks_us()
+            for n in range(0, lookups):
+                cache.get(distance)
+            us_lookup = time.ticks_diff(time.ticks_us(), start)
+            print(curve + ", " + str(distance) + " rows: " + str(len(trajectory)) + " frames, computed in " +
+                  str(us_compute) + " us, cached " + str(us_lookup * 1000 // lookups) + " ns")
+
+
+def construct():
+    # Heap held by a DisplayHandler after construction
+    gc.collect()
+    before = _heap_used()
+    hdisp = DisplayHandler()
+    gc.collect()
+    used = _heap_used() - before
+    print("DisplayHandler(): " + str(used) + " bytes")
+    return used
+
+
+def boot():
+    # Time to import main.py, to construct the clock and to show the first frame of the fast boot.
+    # Run it right after a reset, a second import of main is cached.
+    start = time.ticks_ms()
+    import main
+    ms_import = time.ticks_diff(time.ticks_ms(), start)
+    start = time.ticks_ms()
+    app = main.MatriClock()
+    ms_construct = time.ticks_diff(time.ticks_ms(), start)
+    start = time.ticks_ms()
+    app.show_first_frame()
+    ms_frame = time.ticks_diff(time.ticks_ms(), start)
+    print("import main: " + str(ms_import) + " ms, MatriClock(): " + str(ms_construct) + " ms, first frame: " +
+          str(ms_frame) + " ms")
+    return ms_import, ms_construct, ms_frame
+
+
+def alarms(counts=(5, 100, 1000, 10000), lookups=100):
+    # Time per next alarm lookup for growing alarm schedules
+    alh = AlarmHandler(RTC(), TimerWheel())
+    rtcdt = alh.rtc.datetime()
+    for count in counts:
+        alh.set_alarms([(n % 7, n * 7 % 24, n * 13 % 60) for n in range(0, count)])
+        start = time.ticks_us()
+        for n in range(0, lookups):
+            alh.alarm_next(rtcdt)
+        us = time.ticks_diff(time.ticks_us(), start)
+        print(str(count) + " alarms: " + str(us // lookups) + " us/lookup")
+
+
+def ticker(lengths=(8, 32, 128), steps=100):
+    # Time per scroll step: rasterizing the whole text each step vs. blitting a pre-rendered strip
+    hdisp = DisplayHandler()
+    disp = hdisp.disp
+    for length in lengths:
+        text = ('Time sync ok ' * (length // 13 + 1))[:length]
+
+        start = time.ticks_us()
+        for step in range(0, steps):
+            hdisp.clear()
+            disp.text(text, hdisp.width - step, 0, hdisp.fg_col)
+        us_text = time.ticks_diff(time.ticks_us(), start)
+
+        start = time.ticks_us()
+        strip = Ticker(text, hdisp.width, hdisp.fg_col, hdisp.bg_col)
+        us_raster = time.ticks_diff(time.ticks_us(), start)
+        start = time.ticks_us()
+        for step in range(0, steps):
+            strip.draw(disp, step)
+        us_blit = time.ticks_diff(time.ticks_us(), start)
+
+        print(str(length) + " chars: text " + str(us_text // steps) + " us/step, strip " +
+              str(us_blit // steps) + " us/step (" + str(us_raster) + " us to rasterize)")
+
+
+def events(count=1000):
+    # Time per EventQueue.push, run with the heap locked like in a hard IRQ,
+    # so that any allocation raises MemoryError
+    queue = EventQueue()
+    micropython.heap_lock()
+    try:
+        start = time.ticks_us()
+        for n in range(0, count):
+            queue.push(21, n & 1)
+            if n & 15 == 15:
+                queue.clear()
+        us = time.ticks_diff(time.ticks_us(), start)
+    finally:
+        micropython.heap_unlock()
+    print("push: " + str(us * 1000 // count) + " ns, no allocation")
+    return us
+
+
+def timers(counts=(5, 50, 500)):
+    # Time per TimerWheel.start and per expired timer for growing numbers of
+    # timers, spread over 10 minutes like snooze and sync retry
+    for count in counts:
+        wheel = TimerWheel()
+        ids = [wheel.add() for n in range(0, count)]
+        now = time.ticks_ms()
+        start = time.ticks_us()
+        for id in ids:
+            wheel.start(id, id * 7919 % 600000)
+        us_start = time.ticks_diff(time.ticks_us(), start)
+
+        start = time.ticks_us()
+        fired = 0
+        for second in range(0, 601):
+            fired += wheel.expire(time.ticks_add(now, second * 1000))
+        us_expire = time.ticks_diff(time.ticks_us(), start)
+        print(str(count) + " timers: start " + str(us_start // count) + " us, expire " +
+              str(us_expire // fired) + " us/timer")
+
+
+_WORLDTIMEAPI_BODY = (b'{"abbreviation":"CEST","client_ip":"203.0.113.7","datetime":"2022-10-07T19:03:33.054288+02:00",'
+                      b'"day_of_week":5,"day_of_year":280,"dst":true,"dst_from":"2022-03-27T01:00:00+00:00",'
+                      b'"dst_offset":3600,"dst_until":"2022-10-30T01:00:00+00:00","raw_offset":3600,'
+                      b'"timezone":"Europe/Berlin","unixtime":1665162213,'
+                      b'"utc_datetime":"2022-10-07T17:03:33.054288+00:00","utc_offset":"+02:00","week_number":40}')
+
+
+def sync_parse(body=_WORLDTIMEAPI_BODY):
+    # Heap allocated while parsing a worldtimeapi response: response.text + json.loads vs. json_fields
+    gc.collect()
+    gc.disable()
+    stream = io.BytesIO(body)
+    before = _heap_used()
+    start = time.ticks_us()
+    aDict = json.loads(str(stream.read(), 'utf-8'))
+    fields = (aDict['datetime'], aDict['day_of_week'], aDict['dst_until'])
+    us_json = time.ticks_diff(time.ticks_us(), start)
+    used_json = _heap_used() - before
+    aDict = None
+
+    stream = io.BytesIO(body)
+    before = _heap_used()
+    start = time.ticks_us()
+    fields = timesync.json_fields(stream, timesync._WORLDTIMEAPI_FIELDS)
+    us_stream = time.ticks_diff(time.ticks_us(), start)
+    used_stream = _heap_used() - before
+    gc.enable()
+
+    print("json.loads:  " + str(used_json) + " bytes, " + str(us_json) + " us")
+    print("json_fields: " + str(used_stream) + " bytes, " + str(us_stream) + " us")
+    return used_json, used_stream
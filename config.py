@@ -12,6 +12,16 @@ class Settings:
         (3, 5, 0),
         (4, 6, 0)]
 
+    # You can specify one-time alarms on a certain date here.
+    # Format: (year, month, day, hour, minute)
+    # (2024, 12, 24, 8, 0) means: December 24th, 2024 at 8:00 a.m.
+    alarms_once = []
+
+    # Daily alarms do not ring on these dates, e.g. public holidays.
+    # One-time alarms on these dates still ring.
+    # Format: (year, month, day)
+    alarm_skip_dates = []
+
     snooze_time_m = 10 # snooze time in minutes
     alarm_auto_stop_m = 1 # alarm will stop when no key is pressed for this time (minutes)
 
@@ -40,9 +50,30 @@ class Settings:
     rotation = 'down'  # 'shortest', 'down' or 'up''
     order = -1  # = -1: "4" is above "3"    1: "4" is below "3"
 
+    # How the wheels move: 'classic' takes longer the further a wheel turns,
+    # 'ease' (speeding up and slowing down) and 'spring' (swinging past the character
+    # and back) always take wheel_motion_frames frames of 10 ms
+    wheel_motion = 'classic'
+    wheel_motion_frames = 60
+
     leading_zero = False # leading zero for time display, e.g. "04:59" (True) / " 4:59" (False)
 
     display_inverse = False
+    display_core1 = True  # send the frames to the display from the second core of the RP2040
+
+    # display_modules MAX7219 modules in display_rows rows, the chain runs left to right,
+    # the top row first. display_spi is (SPI id, SCK pin, MOSI pin, CS pin).
+    display_modules = 4
+    display_rows = 1
+    display_spi = (0, 18, 19, 17)
+    display_spi_baudrate = 10000000  # the MAX7219 takes up to 10 MHz, lower it for long wires
+
+    # Wheels per mode, one string per row of modules and one wheel per character:
+    # H hour, M minute, S second, W weekday, D day, T temperature, R humidity, and
+    # the separators ' ', ':' and "'". The modes have to use the same wheels,
+    # modes left out show the 'clock' layout. E.g. for 8 modules {'clock': ('HH:MM:SS',)},
+    # for 16 modules in 2 rows {'clock': ('HH:MM:SS', "WW DD TT'RR")}
+    display_layout = {'clock': ('HH:MM',), 'date': ('WW DD',), 'temp': ("TT'RR",)}
 
 
     # Your local timezone.
@@ -52,13 +83,27 @@ class Settings:
     time_convention_hours = 24  # 12 for 12-hour clock, or 24 for 24-hour clock
 
     language = 'de'  # 'de' or 'en' for displaying the day of week
+    weekday_uppercase = False  # True shows FR instead of Fr
     
     use_dht_sensor = False  # Set to True to use DHT sensor and show temperature/humidity
     temperature_unit = 'C' # 'C' for degrees Celsius, or 'F' for degrees Fahrenheit
+    sensor_interval_s = 60  # time between two measurements, at least 2
+    sensor_history_hours = 24  # measurements kept for min/max/mean
+
+    fast_boot = True  # show the last known time right away, False lights all LEDs for a second first (self test)
+    time_cache = 'timecache.txt'  # file the time is saved to every hour and after each sync, None for no file
+
+    idle_lightsleep = False  # True sleeps between events, but ends the USB serial connection (REPL, statistics)
+
+    button_debounce_ms = 15  # a button has to be stable this long to count as pressed or released
+    button_long_ms = 800  # held this long it is a long press
+    button_double_ms = 400  # pressed again within this time after a short press it is a double press
 
     wifi_ssid = 'MyWiFiSSID'
     wifi_password = 'MyWiFiPassword'
 
+    wifi_power_save = True  # switch the radio off between time syncs
+
     network_use_dhcp = True
     
     # if network_use_dhcp is set to False, then you have to setup the network manually:
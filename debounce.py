@@ -1,47 +1,119 @@
-from machine import Pin
+from machine import Pin, Timer
+from micropython import const
+from array import array
+import micropython
 import time
 
-class Button:  # *****************************************************************************************************************
-
-    def __init__(self, id, handler):
-
-        self.pin = Pin(id, Pin.IN, Pin.PULL_DOWN)
-        self.pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=handler)
-        self._id = id
-        self._debounce_time_ms = 200
-        self._value_before = 0
-        self._value = 0
-        self._pin_value = 0
-        self._pin_value_before = 0
-        self._value_changed_time = 0
-        self._value_changed_time_first = -1
-        self.buttons_enabled = True
-
-    def register_value(self):
-        # call this at the beginning of the button callback function to let
-        # the button object register state changes and to debounce it
-        self._pin_value_before = self._pin_value
-        self._pin_value = self.pin.value()
-
-        if self._pin_value != self._pin_value_before:
-            self._value_changed_time = time.ticks_ms()
-            if self._value_changed_time_first == 0:
-                self._value_changed_time_first = self._value_changed_time
-                self._value_before = self._value
-                self._value = self._pin_value
-            elif self._value_changed_time - self._value_changed_time_first > self._debounce_time_ms:
-                self._value_before = self._value
-                self._value = self._pin_value
-                self._value_changed_time_first = 0
-
-    def get_id(self):
-        return self._id
-
-    def value_changed(self):
-        return self._value_before != self._value
-
-    id = property(get_id)
-
-    def value(self):
-        self._value_before = self._value
-        return self._value
+from config import Settings
+
+# Button events, queued as the value of an EventQueue event
+PRESS = const(1)
+RELEASE = const(2)
+LONG = const(3)  # still pressed after long_ms, follows PRESS
+DOUBLE = const(4)  # second short press within double_ms, follows PRESS
+
+_PERIOD_MS = const(5)
+
+
+class Buttons:  # *****************************************************************************************************************
+
+    # Debounces all buttons with one Timer sampling the pins every 5 ms.
+    #
+    # Each button has an integrator counting up while its pin reads pressed and
+    # down while it reads released. The debounced state only flips when the
+    # integrator reaches the top or zero, so a press is reported debounce_ms after
+    # the contact settles, however much it bounces. The edge IRQs only start the
+    # timer, it stops itself when all buttons are released and settled.
+    # All of it runs in hard IRQs on preallocated arrays and queues the events.
+
+    def __init__(self, ids, events):
+        self.ids = bytes(ids)
+        self._pins = tuple(Pin(id, Pin.IN, Pin.PULL_DOWN) for id in ids)
+        self._events = events
+
+        try:
+            debounce_ms = Settings.button_debounce_ms
+        except AttributeError:
+            debounce_ms = 15
+        try:
+            self.long_ms = Settings.button_long_ms
+        except AttributeError:
+            self.long_ms = 800
+        try:
+            self.double_ms = Settings.button_double_ms
+        except AttributeError:
+            self.double_ms = 400
+
+        self._top = max(debounce_ms // _PERIOD_MS, 1)
+        self._long_samples = self.long_ms // _PERIOD_MS
+        self._integrators = bytearray(len(ids))
+        self._state = 0  # debounced state, bit n is button n
+        self._held = array('H', [0] * len(ids))  # samples since the press
+        self._released_ms = array('L', [0] * len(ids))  # ticks_ms of the last short press release
+        self._short = bytearray(len(ids))  # 1 if the last press was released before long_ms
+
+        self._timer = Timer()
+        self._running = False
+        self._sample_cb = self._sample  # bound once, binding it in the IRQ would allocate
+        self._start_cb = self._start
+        for pin in self._pins:
+            pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=self._edge, hard=True)
+
+    def _edge(self, pin):
+        if not self._running:
+            self._running = True
+            micropython.schedule(self._start_cb, None)
+
+    def _start(self, arg):
+        self._timer.init(mode=Timer.PERIODIC, period=_PERIOD_MS, callback=self._sample_cb)
+
+    def _sample(self, timer):
+        now = time.ticks_ms()
+        settled = True
+        for n in range(0, len(self._pins)):
+            integrator = self._integrators[n]
+            if self._pins[n].value():
+                if integrator < self._top:
+                    integrator += 1
+            elif integrator > 0:
+                integrator -= 1
+            self._integrators[n] = integrator
+
+            bit = 1 << n
+            if self._state & bit:
+                if integrator == 0:
+                    self._state &= ~bit
+                    self._events.push(self.ids[n], RELEASE)
+                    if self._held[n] < self._long_samples:
+                        self._short[n] = 1
+                        self._released_ms[n] = now
+                    else:
+                        self._short[n] = 0
+                else:
+                    if self._held[n] < 0xFFFF:
+                        self._held[n] += 1
+                    if self._held[n] == self._long_samples:
+                        self._events.push(self.ids[n], LONG)
+            elif integrator == self._top:
+                self._state |= bit
+                self._held[n] = 0
+                self._events.push(self.ids[n], PRESS)
+                if self._short[n] and time.ticks_diff(now, self._released_ms[n]) < self.double_ms:
+                    self._short[n] = 0  # a third press starts over
+                    self._events.push(self.ids[n], DOUBLE)
+            if integrator != 0:
+                settled = False
+
+        if settled:
+            self._timer.deinit()
+            self._running = False
+
+    def get_running(self):
+        # True while the timer samples the buttons
+        return self._running
+
+    running = property(get_running)
+
+    def value(self, index):
+        # debounced state of button index
+        return self._state >> index & 1
@@ -1,18 +1,248 @@
 from machine import SPI, Pin
+from micropython import const
+from array import array
+import framebuf
 import max7219
 import time
 
 from config import Settings
+import glyphs
+from motion import Trajectories
+from render import Renderer
+from runtime import ThreadSafeFlag, sleep_ms
+import stats
+
+_NOOP = const(0)
+_DIGIT0 = const(1)
+
+# Wheel timeline segments: (kind, value, direction)
+_SEG_DELAY = const(0)  # value = number of frames standing still
+_SEG_CURVE = const(1)  # value = trajectory from motion.py, offsets multiplied by direction
+
+
+# Default layout for 4 modules: "HH:MM", date "Mo 24", temperature and humidity "21'45"
+_LAYOUT = {'clock': ('HH:MM',), 'date': ('WW DD',), 'temp': ("TT'RR",)}
+_SEPARATORS = " :'"
+
+
+def _setting(name, default):
+    try:
+        return getattr(Settings, name)
+    except AttributeError:
+        return default
+
+
+def _fields(rows):
+    # (field, place, size, row) per layout character, place counts the digits from the right
+    # in a group of equal fields (HH, MM, ...) and size is the length of the group
+    fields = []
+    for row in range(0, len(rows)):
+        text = rows[row]
+        start = 0
+        for n in range(0, len(text) + 1):
+            if n == len(text) or text[n] != text[start]:
+                for m in range(start, n):
+                    fields.append((text[m], n - 1 - m, n - start, row))
+                start = n
+    return fields
+
+
+class Matrix8x8Delta(max7219.Matrix8x8):  # *****************************************************************************************************************
+
+    # Keeps a shadow of the digit registers of every module and only sends the rows
+    # that changed. Modules already holding the right value get a no-op packet.
+    #
+    # With rows > 1 the chain forms rows of num // rows modules, the first module is
+    # the top left one and the chain runs left to right, the top row first. The
+    # framebuffer then covers all rows.
+
+    def __init__(self, spi, cs, num, rows=1):
+        self._shadow = bytearray(8 * num)
+        self._shadow_valid = False
+        self._packet = bytearray(2 * num)
+        self.bytes_sent = 0  # SPI bytes of the last show()
+        self.bytes_saved = 0  # SPI bytes the last show() saved against a full update
+        self.bytes_saved_total = 0
+        super().__init__(spi, cs, num)
+
+        cols = num // rows
+        if rows > 1:
+            self.buffer = bytearray(8 * num)
+            fb = framebuf.FrameBuffer(self.buffer, 8 * cols, 8 * rows, framebuf.MONO_HLSB)
+            self.framebuf = fb
+            self.fill = fb.fill
+            self.pixel = fb.pixel
+            self.hline = fb.hline
+            self.vline = fb.vline
+            self.line = fb.line
+            self.rect = fb.rect
+            self.fill_rect = fb.fill_rect
+            self.text = fb.text
+            self.scroll = fb.scroll
+            self.blit = fb.blit
+        # framebuffer byte of digit register y of module m at [y * num + m]
+        self._index = bytearray(8 * num) if 8 * num <= 256 else array('H', [0] * (8 * num))
+        for y in range(0, 8):
+            for m in range(0, num):
+                self._index[y * num + m] = ((m // cols) * 8 + y) * cols + m % cols
+
+    def init(self):
+        super().init()
+        self.invalidate()
+
+    def invalidate(self):
+        # the next show() sends all rows
+        self._shadow_valid = False
+
+    def show(self, buf=None):
+        # sends buf, by default the framebuffer
+        if buf is None:
+            buf = self.buffer
+        shadow = self._shadow
+        index = self._index
+        packet = self._packet
+        num = self.num
+        valid = self._shadow_valid
+        sent = 0
+
+        for y in range(0, 8):
+            i = y * num
+            changed = False
+            for m in range(0, num):
+                val = buf[index[i + m]]
+                if valid and shadow[i + m] == val:
+                    packet[2 * m] = _NOOP
+                    packet[2 * m + 1] = 0
+                else:
+                    packet[2 * m] = _DIGIT0 + y
+                    packet[2 * m + 1] = val
+                    shadow[i + m] = val
+                    changed = True
+
+            if changed:
+                self.cs(0)
+                self.spi.write(packet)
+                self.cs(1)
+                sent += 2 * num
+                if __debug__:
+                    stats.spi_transactions.add()
+                    stats.spi_bytes.add(2 * num)
+
+        self._shadow_valid = True
+        self.bytes_sent = sent
+        self.bytes_saved = 16 * num - sent
+        self.bytes_saved_total += self.bytes_saved
+
+class FramePacer:
+
+    # Paces frames on absolute ticks_ms deadlines. When rendering falls behind by
+    # a full period or more, the frames in between are dropped to catch up.
+
+    def __init__(self, period_ms):
+        self.period_ms = period_ms
+        self.start()
+
+    def start(self):
+        self._start_ms = time.ticks_ms()
+        self._deadline_ms = self._start_ms
+        self._end_ms = self._start_ms
+        self.skip = 0  # frames to drop before drawing the next one
+        self.frames = 0
+        self.dropped = 0
+        self._late_sum_ms = 0
+        self.jitter_max_ms = 0
+
+    def frame(self):
+        # call right before drawing a frame
+        late = time.ticks_diff(time.ticks_ms(), self._deadline_ms)
+        self.frames += 1
+        self._late_sum_ms += late
+        if late > self.jitter_max_ms:
+            self.jitter_max_ms = late
+
+    def wait_ms(self):
+        # call after drawing a frame, returns the time to wait for the next deadline
+        self._deadline_ms = time.ticks_add(self._deadline_ms, self.period_ms)
+        now = time.ticks_ms()
+        self._end_ms = now
+        late = time.ticks_diff(now, self._deadline_ms)
+        self.skip = 0
+        if late >= self.period_ms > 0:
+            self.skip = late // self.period_ms
+            self.dropped += self.skip
+            self._deadline_ms = time.ticks_add(self._deadline_ms, self.skip * self.period_ms)
+            late -= self.skip * self.period_ms
+        return -late if late < 0 else 0
+
+    def get_elapsed_ms(self):
+        return time.ticks_diff(self._end_ms, self._start_ms)
+
+    elapsed_ms = property(get_elapsed_ms)
+
+    def get_fps(self):
+        elapsed = self.elapsed_ms
+        return self.frames * 1000 / elapsed if elapsed > 0 else 0
+
+    fps = property(get_fps)
+
+    def get_jitter_ms(self):
+        # mean lateness of the drawn frames against their deadlines
+        return self._late_sum_ms / self.frames if self.frames > 0 else 0
+
+    jitter_ms = property(get_jitter_ms)
+
+    def print_stats(self):
+        print("frames: " + str(self.frames) + ", dropped: " + str(self.dropped) +
+              ", fps: " + str(int(self.fps)) + ", jitter: " + str(int(self.jitter_ms)) +
+              " ms (max " + str(self.jitter_max_ms) + " ms)")
+
 
 class DisplayHandler:  # *****************************************************************************************************************
 
-    def __init__(self):
-        spi = SPI(0, sck=Pin(18), mosi=Pin(19))
-        cs = Pin(17, Pin.OUT)
-        self.disp = max7219.Matrix8x8(spi, cs, 4)
+    def __init__(self, modules=None, rows=None, layout=None, disp=None):
+        # The geometry defaults to the display_* settings, see config.py. disp is the
+        # driver to draw to instead of the MAX7219 chain, e.g. a recorder.FrameRecorder
+        if modules is None:
+            modules = _setting('display_modules', 4)
+        if rows is None:
+            rows = _setting('display_rows', 1)
+        if layout is None:
+            layout = _setting('display_layout', _LAYOUT)
+        if modules % rows:
+            raise ValueError("display_modules has to be a multiple of display_rows")
+        self.width = 8 * modules // rows
+        self.height = 8 * rows
+
+        if disp is None:
+            spi_id, sck, mosi, cs = _setting('display_spi', (0, 18, 19, 17))
+            spi = SPI(spi_id, baudrate=_setting('display_spi_baudrate', 10000000), sck=Pin(sck), mosi=Pin(mosi))
+            cs = Pin(cs, Pin.OUT)
+            disp = Matrix8x8Delta(spi, cs, modules, rows)
+        elif len(disp.buffer) != 8 * modules:
+            raise ValueError("disp doesn't have " + str(modules) + " modules")
+        self.disp = disp
         self.disp.brightness(0)
 
+        # frames are sent from the second core where there is one
+        try:
+            display_core1 = Settings.display_core1
+        except AttributeError:
+            display_core1 = True
+        if display_core1 and Renderer.available:
+            self.renderer = Renderer(self.disp)
+        else:
+            self.renderer = None
+
+        # Wheels are blitted as byte strips straight into the driver's
+        # MONO_HLSB buffer. Drivers without a raw buffer fall back to pixel().
+        try:
+            self.bitplane = Bitplane(self.disp.buffer, self.width // 8)
+        except AttributeError:
+            self.bitplane = None
+
         self._playing = False
+        self._move_flag = None  # set once the animate() task is created
+        self._move_next = None
 
         if Settings.display_inverse:
             self.fg_col = 0
@@ -25,6 +255,10 @@ class DisplayHandler:  # *******************************************************
         self.show()
 
         self._row_seconds = 0.01
+        self.pacer = FramePacer(int(self._row_seconds * 1000))
+
+        # how the wheels move, see motion.py
+        self.trajectories = Trajectories(_setting('wheel_motion', 'classic'), _setting('wheel_motion_frames', 60))
         self._brightness = 99  # uninitialized
 
         self._show_colon = False
@@ -34,110 +268,199 @@ class DisplayHandler:  # *******************************************************
         self._show_time_sync_failed = False
         self._time_sync_failed = True
 
-        # characters can be designed with LED matrix editor on
-        # https://xantorohara.github.io/led-matrix-editor/#
-
-        # 0 1 2 3 4 5 6 7 8 9 (space) (0-10)
-        self._char_matrix_digits = [
-            0x1e3333333333331e,
-            0x1818181818181e18,
-            0x3f03060c1830331e,
-            0x1e3330301c30331e,
-            0x303030303f333332,
-            0x1e3330301f03033f,
-            0x1e3333331f03331e,
-            0x0c0c0c0c0c18303f,
-            0x1e3333331e33331e,
-            0x1e3330303e33331e,
-            0x0000000000000000]
-
-        self._char_matrix_colon = [
-            0x0000000000000000,
-            0x0000030300030300,
-            0x0000000000000303]
-
-        # D F M S T W (#11-#16)
-        self._char_matrix_weekday_0 = [
-            0x1f3333333333331f,
-            0x030303031f03033f,
-            0x333333333f3f3321,
-            0x1e3330301e03331e,
-            0x0c0c0c0c0c0c0c3f,
-            0x21333f3f33333333]
-
-        # a e h i o r u
-        self._char_matrix_weekday_1 = [
-            0x3e33333e301e0000,
-            0x1e33031f331e0000,
-            0x333333331f030303,
-            0x0606060606000600,
-            0x1e3333331e000000,
-            0x060606061e000000,
-            0x3e33333333000000]
-
+        # Glyphs are compiled from fonts/glyphs.txt with tools/fontc.py.
         # You can use uppercase characters if you like (FR instead of Fr)
-        # Just exchange _char_matrix_weekday_1 above with the following matrix:
-        '''
-        # A E H I O R U (#11-16)
-        self._char_matrix_weekday_1 = [
-              0x333333333f33331e,
-              0x3f0303031f03033f,
-              0x333333333f333333,
-              0x0c0c0c0c0c0c0c0c,
-              0x1e3333333333331e,
-              0x333333331f33331f,
-              0x1e33333333333333]
-        '''
-
-        self.wheels = (
-            Wheel(self, x=0,  width=6, char_matrix=self._char_matrix_digits +
-                  self._char_matrix_weekday_0, order=Settings.order),
-            Wheel(self, x=7,  width=6, char_matrix=self._char_matrix_digits +
-                  self._char_matrix_weekday_1, order=Settings.order),
-            Wheel(self, x=14, width=2,
-                  char_matrix=self._char_matrix_colon, order=Settings.order),
-            Wheel(self, x=17, width=6,
-                  char_matrix=self._char_matrix_digits, order=Settings.order),
-            Wheel(self, x=24, width=6,
-                  char_matrix=self._char_matrix_digits, order=Settings.order)
-        )
+        try:
+            weekday_uppercase = Settings.weekday_uppercase
+        except AttributeError:
+            weekday_uppercase = False
+        if weekday_uppercase:
+            weekday_1 = (glyphs.WEEKDAY_1_UPPER, glyphs.WEEKDAY_1_UPPER_CHARS)
+        else:
+            weekday_1 = (glyphs.WEEKDAY_1, glyphs.WEEKDAY_1_CHARS)
+
+        # Glyph sets are shared by the wheels instead of being concatenated per wheel,
+        # wheels with the same glyph sets and width also share their strip
+        glyph_sets = {
+            ':': ((glyphs.COLON,), glyphs.COLON_CHARS),
+            '0': ((glyphs.DIGITS,), glyphs.DIGITS_CHARS),
+            'W0': ((glyphs.DIGITS, glyphs.WEEKDAY_0), glyphs.DIGITS_CHARS + glyphs.WEEKDAY_0_CHARS),
+            'W1': ((glyphs.DIGITS, weekday_1[0]), glyphs.DIGITS_CHARS + weekday_1[1]),
+        }
+        self._strips = {}
+
+        # One wheel per layout character, 6 columns wide plus one blank column,
+        # separators 2 plus one. A wheel shows the field of its character in
+        # each mode, the rows of modules are filled from the top.
+        self._layout = {}
+        for mode in layout:
+            self._layout[mode] = _fields(layout[mode])
+        fields = self._layout['clock']
+        for mode in self._layout:
+            if [(field[0] in _SEPARATORS, field[3]) for field in self._layout[mode]] != \
+                    [(field[0] in _SEPARATORS, field[3]) for field in fields]:
+                raise ValueError("display_layout: " + mode + " doesn't match the wheels of clock")
+        wheels = []
+        x = 0
+        for index in range(0, len(fields)):
+            row = fields[index][3]
+            if index > 0 and row != fields[index - 1][3]:
+                x = 0
+            if fields[index][0] in _SEPARATORS:
+                sets = glyph_sets[':']
+                width = 2
+            else:
+                sets = glyph_sets['0']
+                for mode in self._layout:
+                    if self._layout[mode][index][0] == 'W':
+                        sets = glyph_sets['W0' if self._layout[mode][index][1] == 1 else 'W1']
+                width = 6
+            if x + width > self.width - (1 if row == 0 else 0):  # the top right column shows the status
+                raise ValueError("display_layout: row " + str(row) + " is too wide")
+            wheels.append(Wheel(self, index=index, x=x, y=8 * row, width=width,
+                                char_sets=sets[0], chars=sets[1], order=Settings.order))
+            x += width + 1
+        self.wheels = tuple(wheels)
 
         self.index_count = len(self.wheels)
 
+        # the wheels of a row start one after the other, from right to left
+        for wheel in self.wheels:
+            wheel.delay_frames = 12 * sum(1 for other in self.wheels if other.y == wheel.y and other.x > wheel.x)
+
+        # leading zeros shown as blanks
+        self._blank_zero = 'T' if Settings.leading_zero else 'HT'
+
+        self.seconds_shown = False
+        for mode in self._layout:
+            for field in self._layout[mode]:
+                if field[0] == 'S':
+                    self.seconds_shown = True
+
+    def chars_of(self, mode, values):
+        # Wheel characters showing values in the layout of mode. values maps the
+        # field letters to numbers (None is blank) and W to the weekday name.
+        chars = []
+        fields = self._layout.get(mode, self._layout['clock'])
+        for index in range(0, self.index_count):
+            field, place, size, row = fields[index]
+            wheel = self.wheels[index]
+            if field in _SEPARATORS:
+                name = field
+            elif field == 'W':
+                name = values['W'][size - 1 - place]
+            else:
+                value = values.get(field)
+                if value is None:
+                    name = ' '
+                else:
+                    digit = value // 10 ** place % 10
+                    if digit == 0 and place == size - 1 and place > 0 and field in self._blank_zero:
+                        name = ' '  # leading zero
+                    else:
+                        name = str(digit)
+            chars.append(wheel.char_of(name))
+        return chars
+
+    def blank_chars(self):
+        return [wheel.char_of(' ') for wheel in self.wheels]
+
     def wheels_move_to(self, chars, show_alarm_enabled, show_time_sync_failed):
+        if self._move_flag is None:
+            self.frames_create(chars, show_alarm_enabled, show_time_sync_failed)
+            self.frames_play()
+        else:
+            # animate() picks the move up, a newer move replaces a waiting one
+            self._move_next = (chars, show_alarm_enabled, show_time_sync_failed)
+            self._move_flag.set()
+
+    def wheels_set(self, chars, show_alarm_enabled, show_time_sync_failed):
+        # Shows chars right away in a single frame, the wheels don't move
+        self._show_alarm_enabled = show_alarm_enabled
+        self._show_time_sync_failed = show_time_sync_failed
+        self.clear()
+        self.draw_info()
+        self.draw_time_sync_failed()
+        for index in range(0, self.index_count):
+            self.wheels[index].frames_reset()
+            self.wheels[index].draw_pos(self.wheels[index].pos_of_char(chars[index]))
+        self.show()
+
+    def frames_create(self, chars, show_alarm_enabled, show_time_sync_failed):
         self._show_alarm_enabled = show_alarm_enabled
         self._show_time_sync_failed = show_time_sync_failed
         print("wheels_move_to", chars)
 
+        # Resend everything once per move, in case a module lost its registers
+        self.invalidate()
+
         # Create motion frames for digit wheels 0-3:
         for index in range(0, self.index_count):
             self.wheels[index].frame_move_to(chars[index])
 
-        # Play frames, just like a short movie       
-        self.frames_play()
+    def animate(self):
+        # Task playing the moves requested by wheels_move_to(). The moves are
+        # queued as soon as the task is created, also before it runs the first time.
+        self._move_flag = ThreadSafeFlag()
+        return self._animate()
+
+    async def _animate(self):
+        while True:
+            await self._move_flag.wait()
+            while self._move_next is not None:
+                chars, show_alarm_enabled, show_time_sync_failed = self._move_next
+                self._move_next = None
+                self.frames_create(chars, show_alarm_enabled, show_time_sync_failed)
+                await self.frames_play_async()
+
+    def frame_draw(self, skip=0):
+        # Draws the next frame, returns False once all wheels have stopped
+        self.clear()
+        self.draw_info()
+        self.draw_time_sync_failed()
+
+        playing = False
+        for index in range(0, self.index_count):
+            if skip > 0:
+                self.wheels[index].frame_skip(skip)
+            playing = self.wheels[index].draw_next() or playing
+
+        self.show()
+        if __debug__:
+            stats.frames.add()
+        return playing
 
     def frames_play(self):
+        # Play frames, just like a short movie
         self._playing = True
+        self.pacer.start()
         while self._playing:
-            self.clear()
-            self.draw_info()
-            self.draw_time_sync_failed()
-
-            self._playing = False
-            for index in range(0, self.index_count):
-                self._playing = self.wheels[index].draw_next() or self._playing
-
-            self.show()
-            time.sleep(self._row_seconds)
+            self.pacer.frame()
+            self._playing = self.frame_draw(self.pacer.skip)
+            time.sleep_ms(self.pacer.wait_ms())
+        self.pacer.print_stats()
+        if __debug__:
+            stats.move_ms.add(self.pacer.elapsed_ms)
+
+    async def frames_play_async(self):
+        self._playing = True
+        self.pacer.start()
+        while self._playing:
+            self.pacer.frame()
+            self._playing = self.frame_draw(self.pacer.skip)
+            await sleep_ms(self.pacer.wait_ms())
+        self.pacer.print_stats()
+        if __debug__:
+            stats.move_ms.add(self.pacer.elapsed_ms)
 
     def draw_info(self):
         if self.alarm_enabled and self._show_alarm_enabled:
-            self.disp.pixel(31, 7, self.fg_col)
+            self.disp.pixel(self.width - 1, 7, self.fg_col)
 
     def draw_time_sync_failed(self):
         if self.time_sync_failed and self._show_time_sync_failed:
-            self.disp.vline(31, 0, 3, self.fg_col)
-            self.disp.pixel(31, 4, self.fg_col)
+            self.disp.vline(self.width - 1, 0, 3, self.fg_col)
+            self.disp.pixel(self.width - 1, 4, self.fg_col)
 
     def refresh(self):
         self.clear()
@@ -159,10 +482,26 @@ class DisplayHandler:  # *******************************************************
                     self.disp.pixel(x + col, y, self.fg_col)
 
     def show(self):
-        self.disp.show()
+        if self.renderer is None:
+            self.disp.show()
+        else:
+            self.renderer.submit()
+
+    def flush(self):
+        # waits until the last frame is on the display
+        if self.renderer is not None:
+            self.renderer.flush()
+
+    def invalidate(self):
+        # the next frame resends all rows
+        if self.renderer is None:
+            self.disp.invalidate()
+        else:
+            self.renderer.invalidate()
 
     def _set_brightness(self, value):
         if self._brightness != value:
+            self.flush()  # the SPI is free again
             self.disp.brightness(value)
             print("brightness: " + str(self._brightness) + " -> " + str(value))
             self._brightness = value
@@ -174,7 +513,7 @@ class DisplayHandler:  # *******************************************************
 
 
     def _get_playing(self):
-        return self._playing
+        return self._playing or self._move_next is not None
     
     playing = property(_get_playing)
     
@@ -190,12 +529,29 @@ class DisplayHandler:  # *******************************************************
             self.brightness = Settings.brightness_night
 
     def ticker(self, text):
-        t = text + "    "
-        for x in range(32, len(t)*-8, -1):
-            self.clear()
-            self.disp.text(t, x, 0, self.fg_col)
-            self.disp.show()
-            time.sleep(self._row_seconds)
+        # scrolls text through the display from right to left
+        ticker = text if isinstance(text, Ticker) else Ticker(text, self.width, self.fg_col, self.bg_col)
+        self.clear()  # the ticker scrolls in the top row of modules, the rows below stay blank
+        self.pacer.start()
+        step = 0
+        while step < ticker.steps:
+            self.pacer.frame()
+            ticker.draw(self.disp, step)
+            self.show()
+            time.sleep_ms(self.pacer.wait_ms())
+            step += 1 + self.pacer.skip
+
+    async def ticker_async(self, text):
+        ticker = text if isinstance(text, Ticker) else Ticker(text, self.width, self.fg_col, self.bg_col)
+        self.clear()  # the ticker scrolls in the top row of modules, the rows below stay blank
+        self.pacer.start()
+        step = 0
+        while step < ticker.steps:
+            self.pacer.frame()
+            ticker.draw(self.disp, step)
+            self.show()
+            await sleep_ms(self.pacer.wait_ms())
+            step += 1 + self.pacer.skip
 
     def clear(self):
         self.disp.fill(self.bg_col)
@@ -227,29 +583,84 @@ class DisplayHandler:  # *******************************************************
     time_sync_failed = property(
         _get_time_sync_failed, _set_time_sync_failed)
 
+class Ticker:
+
+    # Text rasterized once into an off-screen strip with a display width of blank
+    # columns on both sides, so that it scrolls in from the right and out to the left.
+    # Each step blits a display wide window of the strip, which costs the same for
+    # any text length. Keep a Ticker to show the same text again without rasterizing.
+    # The strip is one module high, on a display with more rows of modules it
+    # scrolls in the top row, DisplayHandler.ticker() clears the rest first.
+
+    def __init__(self, text, width, fg_col=1, bg_col=0):
+        self.width = width
+        self.steps = len(text) * 8 + width + 1  # the last step is blank again
+        strip_width = len(text) * 8 + 2 * width
+        self._fbuf = framebuf.FrameBuffer(bytearray((strip_width + 7) // 8 * 8),
+                                          strip_width, 8, framebuf.MONO_HLSB)
+        self._fbuf.fill(bg_col)
+        self._fbuf.text(text, width, 0, fg_col)
+
+    def draw(self, disp, step):
+        # covers the top 8 rows of disp, the rows below (display_rows > 1) aren't drawn
+        disp.blit(self._fbuf, -step, 0)
+
+
+class Bitplane:
+
+    # Pixel row y of module column m is byte (y * modules + m) in the buffer, modules
+    # per row of modules, MSB = leftmost column
+
+    def __init__(self, buffer, modules):
+        self.buffer = buffer
+        self.modules = modules
+
+    def blit_strip(self, strip, offset, col, shift, mask):
+        # Writes strip[offset:offset+8] into rows 0-7, starting at byte column col.
+        # Each strip byte is shifted into a 16 bit window covering col and col+1,
+        # mask marks the window bits owned by the strip.
+        buf = self.buffer
+        stride = self.modules
+        keep_hi = ~(mask >> 8) & 0xFF
+        keep_lo = ~mask & 0xFF
+        i = col
+
+        if keep_lo == 0xFF:  # strip fits into a single byte column
+            for y in range(offset, offset + 8):
+                buf[i] = buf[i] & keep_hi | strip[y] << shift >> 8
+                i += stride
+        else:
+            for y in range(offset, offset + 8):
+                val = strip[y] << shift
+                buf[i] = buf[i] & keep_hi | val >> 8
+                buf[i + 1] = buf[i + 1] & keep_lo | val & 0xFF
+                i += stride
+
+
 class Wheel:
 
-    def __init__(self, hdisp, x, width, char_matrix, order):
+    def __init__(self, hdisp, index, x, width, char_sets, chars, order, y=0):
         self._hdisp = hdisp
+        self._index = index
         self._x = x
+        self._y = y
+        self.delay_frames = 0  # standing still at the start of a move
         self._pos = 0
         self._width = width
-        self._char_matrix = char_matrix
-        self._char_count = len(self._char_matrix)
-        self._char_height = 9
+        self._char_height = 9  # glyphs.py has 9 rows per glyph
+        self._char_sets = char_sets
+        self._chars = chars
+        self._char_count = 0
+        for char_set in char_sets:
+            self._char_count += len(char_set) // self._char_height
         self._pos_count = self._char_height * self._char_count  # 99
         self._order = order
 
-        self._start_pattern = (0, 0, 0, 1, 0, 0, 0, 1, 0,
-                               0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 1, 0)
-        self._stop_pattern = (1, 1, 1, 0, 1, 0, 0, 1, 0, -1, 0, 0, -1, 0,
-                              0, -1, 0, 0, -1, 0, 0, 0, -1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, -1)
-
         self.frames_reset()
-        self.build()
+        self.build_strip()
 
     def get_index(self):
-        return self._hdisp.wheels.index(self)
+        return self._index
 
     index = property(get_index)
 
@@ -258,65 +669,110 @@ class Wheel:
 
     x = property(get_x)
 
-    def get_char(self):
-        return self._wheel[self._pos][0]
-
-    char = property(get_char)
+    def get_y(self):
+        return self._y
 
-    def build(self):
-        # creates all positions possible on the wheel as an array self._wheel
-        self._wheel = []
+    y = property(get_y)
 
-        for pos in range(0, self._pos_count):
-            char_num = (self._pos_count-1-pos //
-                        self._char_height + 1) % self._char_count
-
-            if self._order == 1:
-                char_num = (self._char_count - char_num) % self._char_count
+    def get_char(self):
+        return self.char_at(self._pos)
 
-            row = pos % self._char_height
+    char = property(get_char)
 
-            self._wheel.append((char_num, row))
+    def char_at(self, pos):
+        # character shown at row (pos % char_height) of wheel position pos
+        char_num = (self._pos_count-1-pos //
+                    self._char_height + 1) % self._char_count
+
+        if self._order == 1:
+            char_num = (self._char_count - char_num) % self._char_count
+
+        return char_num
+
+    def glyph_row(self, char, row):
+        # row byte of char with the leftmost column in bit 7
+        for char_set in self._char_sets:
+            count = len(char_set) // self._char_height
+            if char < count:
+                return char_set[char * self._char_height + row]
+            char -= count
+
+    def char_of(self, name):
+        # number of the character named name in glyphs.py, either case
+        if name not in self._chars:
+            name = name.swapcase()
+        return self._chars.index(name)
+
+    def build_strip(self):
+        # creates one display row byte per wheel position as self._strip,
+        # extended by 7 rows so that draw_pos never has to wrap around
+        width_mask = (0xFF << (8 - self._width)) & 0xFF
+        invert_mask = width_mask if self._hdisp.fg_col == 0 else 0
+
+        key = (id(self._char_sets), self._width)
+        self._strip = self._hdisp._strips.get(key)
+        if self._strip is None:
+            self._strip = bytearray(self._pos_count + 7)
+            for pos in range(0, self._pos_count + 7):
+                pos_wheel = pos % self._pos_count
+                val_col = self.glyph_row(self.char_at(pos_wheel), pos_wheel % self._char_height)
+                self._strip[pos] = val_col & width_mask ^ invert_mask
+            self._hdisp._strips[key] = self._strip
+
+        self._strip_col = self._y * self._hdisp.width // 8 + self._x // 8
+        self._strip_shift = 8 - self._x % 8
+        self._strip_mask = width_mask << self._strip_shift
+
+    def pos_of_char(self, char):
+        # position showing char at row 0
+        if self._order == 1:
+            return char * self._char_height
+        return (-char) % self._char_count * self._char_height
 
     def frames_reset(self):
-        self._frames = []
-        self._frame = -1
-
-    def frame_add(self, direction):
-        if self._frames == []:
-            pos_last = self._pos
-        else:
-            pos_last = self._frames[-1]
-
-        pos_new = (pos_last + direction) % self._pos_count
-        self._frames.append(pos_new)
-
-        return pos_new
+        self._timeline = None
+        self._frames_left = 0
 
     def frame_add_to_char(self, char, direction):
 
-        chr_current, char_row_current = self._wheel[self._pos]
+        chr_current = self.char_at(self._pos)
+        char_row_current = self._pos % self._char_height
 
         if not chr_current == char and char_row_current == 0:
 
-            for pos in range(0, (4-self.index)*12):  # 4 = 5 Wheels -> 0-based
-                self.frame_add(0)
-
-            for sign in self._start_pattern:
-                self.frame_add(sign*direction)
+            delay = self.delay_frames
+            distance = (self.pos_of_char(char) - self._pos) * direction % self._pos_count
+            trajectory = self._hdisp.trajectories.get(distance)
 
-            while not (chr_current == char and char_row_current == 0):
-                pos_new = self.frame_add(direction)
+            segments = ((_SEG_DELAY, delay, 0),
+                        (_SEG_CURVE, trajectory, direction))
 
-                chr_current, char_row_current = self._wheel[pos_new]
+            self._frames_left = delay + len(trajectory)
+            self._timeline = self.frames_expand(segments, self._pos)
 
-            for sign in self._stop_pattern:
-                self.frame_add(sign*direction)
+    def frames_expand(self, segments, pos):
+        # yields the positions of a timeline one frame at a time
+        for kind, value, direction in segments:
+            if kind == _SEG_DELAY:
+                for frame in range(0, value):
+                    yield pos
+            else:
+                start = pos
+                for offset in value:
+                    pos = (start + offset * direction) % self._pos_count
+                    yield pos
+
+    def frame_skip(self, count):
+        # advances the animation without drawing, the last frame is never skipped
+        count = min(count, self._frames_left - 1)
+        for frame in range(0, count):
+            next(self._timeline)
+            self._frames_left -= 1
 
     def draw_next(self):
-        if self._frames != [] and self._frame < len(self._frames)-1:
-            self._frame += 1
-            self.draw_pos(self._frames[self._frame])
+        if self._frames_left > 0:
+            self._frames_left -= 1
+            self.draw_pos(next(self._timeline))
             ret = True
         else:
             self.draw_pos(self._pos)
@@ -328,17 +784,33 @@ class Wheel:
     def draw_pos(self, pos):
         self._pos = pos % self._pos_count  # 98 -> 98,   99 -> 0,  -1 -> 98
 
+        if __debug__:
+            start = time.ticks_us()
+
+        if self._hdisp.bitplane is not None:
+            self._hdisp.bitplane.blit_strip(self._strip, self._pos, self._strip_col,
+                                            self._strip_shift, self._strip_mask)
+            if __debug__:
+                stats.buffer_bytes.add(8 if self._strip_mask & 0xFF == 0 else 16)
+        else:
+            self.draw_pos_pixels(self._pos)
+            if __debug__:
+                stats.pixels.add(8 * self._width)
+
+        if __debug__:
+            stats.draw_pos_us.add(time.ticks_diff(time.ticks_us(), start))
+
+    def draw_pos_pixels(self, pos):
         for y in range(0, 8):
-            wp2 = (self._pos + y) % self._pos_count
-            chr, char_row = self._wheel[wp2]
-            self.draw_character_row(chr, self._x, y, char_row)
+            wp2 = (pos + y) % self._pos_count
+            self.draw_character_row(self.char_at(wp2), self._x, self._y + y, wp2 % self._char_height)
 
     def draw_character_row(self, chr, x, y, char_row):
         if char_row >= 0:
-            val_col = (self._char_matrix[chr] >> 8 * char_row) & 0xFF
+            val_col = self.glyph_row(chr, char_row)
             for col in range(0, self._width):
                 self._hdisp.disp.pixel(
-                    x + col, y, self._hdisp.fg_col if 1 << col & val_col else self._hdisp.bg_col)
+                    x + col, y, self._hdisp.fg_col if 0x80 >> col & val_col else self._hdisp.bg_col)
 
     def refresh(self):
         self.draw_pos(self._pos)  # Just refresh the wheel's display
@@ -0,0 +1,62 @@
+from array import array
+
+
+class DriftModel:
+
+    # Learns how fast the RTC runs from the offsets measured at each time sync.
+    #
+    # At a sync, the RTC has drifted by ppm * interval and has been corrected by
+    # correction() in between. The drift of the last samples, summed and divided
+    # by the summed intervals, gives the rate in ppm (long intervals weigh more).
+    # Setting the RTC drops the fraction of the current second, so the learned
+    # rate includes what the correction steps themselves lose.
+    #
+    # Both times are UTC, so that a daylight saving time change isn't taken for
+    # drift. An offset beyond max_ppm of the interval can't be the crystal either
+    # (a wrong answer, the RTC set by hand), it isn't learned.
+
+    def __init__(self, samples=4, max_ppm=500):
+        self.ppm = 0
+        self.max_ppm = max_ppm
+        self.residual_s = None  # RTC error left at the last sync despite the correction
+        self.accepted = True  # False if the offset at the last sync wasn't learned
+        self._drift_s = array('f', [0] * samples)
+        self._interval_s = array('f', [0] * samples)
+        self._count = 0
+        self._next = 0
+        self._synced_s = None  # reference time of the last sync
+        self._corrected_s = 0  # steps applied since the last sync
+
+    def sync(self, rtc_s, ref_s):
+        # rtc_s: RTC time right before it is set, ref_s: the reference time it is set to, both UTC
+        self.accepted = True
+        if self._synced_s is not None:
+            interval = ref_s - self._synced_s
+            if interval >= 3600:
+                self.residual_s = rtc_s - ref_s
+                drift = self.residual_s - self._corrected_s
+                self.accepted = abs(drift) * 1000000 <= self.max_ppm * interval
+                if self.accepted:
+                    self._drift_s[self._next] = drift
+                    self._interval_s[self._next] = interval
+                    self._next = (self._next + 1) % len(self._drift_s)
+                    self._count = min(self._count + 1, len(self._drift_s))
+
+                    drift = 0
+                    interval = 0
+                    for n in range(0, self._count):
+                        drift += self._drift_s[n]
+                        interval += self._interval_s[n]
+                    self.ppm = drift * 1000000 / interval
+
+        self._synced_s = ref_s
+        self._corrected_s = 0
+
+    def correction(self, rtc_s):
+        # Returns the whole seconds the RTC has to be stepped by now, rtc_s in UTC
+        if self._synced_s is None or self.ppm == 0:
+            return 0
+        due = -(rtc_s - self._synced_s) * self.ppm / 1000000
+        step = int(due - self._corrected_s)
+        self._corrected_s += step
+        return step
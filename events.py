@@ -0,0 +1,56 @@
+from array import array
+import micropython
+import time
+
+from runtime import ThreadSafeFlag
+
+
+class EventQueue:
+
+    # Ring buffer of input events, pushed from hard IRQ handlers and drained by the main loop.
+    #
+    # push() only writes into the preallocated arrays, so it never allocates and can run
+    # in a hard IRQ. The flag waking the main loop is set through micropython.schedule,
+    # once when the queue stops being empty. When the queue is full, new events are
+    # counted in dropped and discarded.
+
+    def __init__(self, size=32):
+        self._ids = bytearray(size)
+        self._values = bytearray(size)
+        self._ticks_us = array('L', [0] * size)
+        self._head = 0  # next event to write
+        self._tail = 0  # next event to read
+        self.dropped = 0
+        self.flag = ThreadSafeFlag()
+        self._wake = self._wake_cb  # bound once, binding it in the IRQ would allocate
+
+    def push(self, id, value):
+        head = self._head
+        next = head + 1
+        if next == len(self._ids):
+            next = 0
+        if next == self._tail:
+            self.dropped += 1
+            return
+        self._ids[head] = id
+        self._values[head] = value
+        self._ticks_us[head] = time.ticks_us()
+        self._head = next
+        if head == self._tail:
+            micropython.schedule(self._wake, None)
+
+    def _wake_cb(self, arg):
+        self.flag.set()
+
+    def pending(self):
+        return self._head != self._tail
+
+    def pop(self):
+        # (id, value, ticks_us) of the oldest event, call only while pending()
+        tail = self._tail
+        event = (self._ids[tail], self._values[tail], self._ticks_us[tail])
+        self._tail = tail + 1 if tail + 1 < len(self._ids) else 0
+        return event
+
+    def clear(self):
+        self._tail = self._head
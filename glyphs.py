@@ -0,0 +1,53 @@
+# Generated by tools/fontc.py from fonts/glyphs.txt, do not edit.
+#
+# 9 bytes per glyph: rows 0-7 from top to bottom and an empty spacer row,
+# the leftmost column is bit 7. <SET>_CHARS names the glyphs in order.
+
+DIGITS_CHARS = '0123456789 '
+DIGITS = (
+          b'\x78\xcc\xcc\xcc\xcc\xcc\xcc\x78\x00'
+          b'\x18\x78\x18\x18\x18\x18\x18\x18\x00'
+          b'\x78\xcc\x0c\x18\x30\x60\xc0\xfc\x00'
+          b'\x78\xcc\x0c\x38\x0c\x0c\xcc\x78\x00'
+          b'\x4c\xcc\xcc\xfc\x0c\x0c\x0c\x0c\x00'
+          b'\xfc\xc0\xc0\xf8\x0c\x0c\xcc\x78\x00'
+          b'\x78\xcc\xc0\xf8\xcc\xcc\xcc\x78\x00'
+          b'\xfc\x0c\x18\x30\x30\x30\x30\x30\x00'
+          b'\x78\xcc\xcc\x78\xcc\xcc\xcc\x78\x00'
+          b'\x78\xcc\xcc\x7c\x0c\x0c\xcc\x78\x00'
+          b'\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+
+COLON_CHARS = " :'"
+COLON = (
+         b'\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+         b'\x00\xc0\xc0\x00\xc0\xc0\x00\x00\x00'
+         b'\xc0\xc0\x00\x00\x00\x00\x00\x00\x00')
+
+WEEKDAY_0_CHARS = 'DFMSTW'
+WEEKDAY_0 = (
+             b'\xf8\xcc\xcc\xcc\xcc\xcc\xcc\xf8\x00'
+             b'\xfc\xc0\xc0\xf8\xc0\xc0\xc0\xc0\x00'
+             b'\x84\xcc\xfc\xfc\xcc\xcc\xcc\xcc\x00'
+             b'\x78\xcc\xc0\x78\x0c\x0c\xcc\x78\x00'
+             b'\xfc\x30\x30\x30\x30\x30\x30\x30\x00'
+             b'\xcc\xcc\xcc\xcc\xfc\xfc\xcc\x84\x00')
+
+WEEKDAY_1_CHARS = 'aehioru'
+WEEKDAY_1 = (
+             b'\x00\x00\x78\x0c\x7c\xcc\xcc\x7c\x00'
+             b'\x00\x00\x78\xcc\xf8\xc0\xcc\x78\x00'
+             b'\xc0\xc0\xc0\xf8\xcc\xcc\xcc\xcc\x00'
+             b'\x00\x60\x00\x60\x60\x60\x60\x60\x00'
+             b'\x00\x00\x00\x78\xcc\xcc\xcc\x78\x00'
+             b'\x00\x00\x00\x78\x60\x60\x60\x60\x00'
+             b'\x00\x00\x00\xcc\xcc\xcc\xcc\x7c\x00')
+
+WEEKDAY_1_UPPER_CHARS = 'AEHIORU'
+WEEKDAY_1_UPPER = (
+                   b'\x78\xcc\xcc\xfc\xcc\xcc\xcc\xcc\x00'
+                   b'\xfc\xc0\xc0\xf8\xc0\xc0\xc0\xfc\x00'
+                   b'\xcc\xcc\xcc\xfc\xcc\xcc\xcc\xcc\x00'
+                   b'\x30\x30\x30\x30\x30\x30\x30\x30\x00'
+                   b'\x78\xcc\xcc\xcc\xcc\xcc\xcc\x78\x00'
+                   b'\xf8\xcc\xcc\xf8\xcc\xcc\xcc\xcc\x00'
+                   b'\xcc\xcc\xcc\xcc\xcc\xcc\xcc\x78\x00')
@@ -0,0 +1,136 @@
+from micropython import const
+import errno
+import time
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+# HttpGet steps
+_RESOLVE = const(0)
+_CONNECT = const(1)
+_SEND = const(2)
+_STATUS = const(3)  # status line
+_HEADERS = const(4)
+_BODY = const(5)
+_DONE = const(6)
+
+_NOT_YET = (errno.EAGAIN, errno.EINPROGRESS, errno.EALREADY, errno.ENOTCONN)
+
+
+class HttpGet:
+
+    # HTTP/1.0 GET over a non-blocking socket, done in small steps.
+    #
+    # Each poll() does one step (resolve the host, connect, send the request, read
+    # what has arrived) and never waits for the network, except that the host name
+    # lookup (getaddrinfo) blocks in lwIP, which is why it is a step of its own.
+    # The body is passed to sink(buf, count) piece by piece as it arrives, it is
+    # never held in memory. poll() raises OSError on errors and after timeout_ms.
+
+    def __init__(self, url, sink, timeout_ms=5000, size=64):
+        proto, dummy, host, path = url.split('/', 3)
+        if ':' in host:
+            host, port = host.split(':', 1)
+            port = int(port)
+        else:
+            port = 80
+        self._host = host
+        self._port = port
+        self._request = b'GET /' + path.encode() + b' HTTP/1.0\r\nHost: ' + host.encode() + b'\r\n\r\n'
+        self._sent = 0
+        self._sink = sink
+        self._buf = bytearray(size)
+        self._sock = None
+        self._step = _RESOLVE
+        self._start_ticks_ms = time.ticks_ms()
+        self.timeout_ms = timeout_ms
+        self.status = None  # status code, once the status line is read
+        self._line = bytearray()  # status line
+        self._eol = 0  # line ends in a row in the headers, 2 ends them
+
+    def poll(self):
+        # Does one step, returns the ms until the next call, None once the response is complete
+        if self._step == _DONE:
+            return None
+        if time.ticks_diff(time.ticks_ms(), self._start_ticks_ms) > self.timeout_ms:
+            self.close()
+            raise OSError(errno.ETIMEDOUT)
+        try:
+            return self._poll()
+        except OSError as e:
+            if e.args[0] in _NOT_YET:
+                return 20
+            self.close()
+            raise
+
+    def _poll(self):
+        if self._step == _RESOLVE:
+            self._address = socket.getaddrinfo(self._host, self._port, 0, socket.SOCK_STREAM)[0][-1]
+            self._step = _CONNECT
+            return 0
+
+        if self._step == _CONNECT:
+            self._sock = socket.socket()
+            self._sock.setblocking(False)
+            self._step = _SEND
+            self._sock.connect(self._address)  # EINPROGRESS while connecting
+            return 0
+
+        if self._step == _SEND:
+            sent = self._sock.send(memoryview(self._request)[self._sent:])
+            if sent:
+                self._sent += sent
+            if self._sent == len(self._request):
+                self._step = _STATUS
+            return 0
+
+        count = self._sock.readinto(self._buf)
+        if count is None:  # nothing arrived yet
+            return 20
+        if count == 0:  # the server closed the connection after the body
+            self.close()
+            if self.status is None:
+                raise OSError(errno.ECONNRESET)
+            self._step = _DONE
+            return None
+        self._receive(count)
+        return 0
+
+    def _receive(self, count):
+        buf = self._buf
+        start = 0
+        if self._step == _STATUS:
+            while start < count and buf[start] != 0x0a:
+                if len(self._line) < 32:
+                    self._line.append(buf[start])
+                start += 1
+            if start == count:
+                return
+            try:
+                self.status = int(bytes(self._line).split()[1])  # HTTP/1.0 200 OK
+            except (ValueError, IndexError):
+                raise OSError(errno.EIO)
+            self._step = _HEADERS
+            self._eol = 1
+            start += 1
+        if self._step == _HEADERS:
+            while start < count and self._eol < 2:
+                c = buf[start]
+                if c == 0x0a:
+                    self._eol += 1
+                elif c != 0x0d:
+                    self._eol = 0
+                start += 1
+            if self._eol < 2:
+                return
+            self._step = _BODY
+        if start < count:
+            if start:
+                buf[0:count - start] = buf[start:count]
+            self._sink(buf, count - start)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,63 @@
+import machine
+import time
+
+from config import Settings
+from runtime import idle_ms
+
+
+class IdleHandler:
+
+    # Tickless idle: while nothing is due, the CPU sleeps with machine.lightsleep
+    # until the next task deadline, a button edge wakes it up earlier.
+    # Keeps track of the time asleep to estimate the current draw of the board.
+    #
+    # Off by default, the USB serial connection (REPL, the statistics commands)
+    # doesn't survive light sleep. Stays off where runtime.idle_ms is None.
+
+    # rough Pico W figures without the display and the radio
+    awake_ma = 22.0
+    sleep_ma = 1.4
+
+    def __init__(self):
+        try:
+            self.enabled = Settings.idle_lightsleep
+        except AttributeError:
+            self.enabled = False
+        if self.enabled and idle_ms is None:
+            print("idle: no light sleep, this uasyncio doesn't tell when its next task is due")
+            self.enabled = False
+        self.min_sleep_ms = 50  # shorter waits aren't worth the clock switching
+        self.max_sleep_ms = 60000
+        self.reset()
+
+    def sleep(self, ms):
+        start = time.ticks_ms()
+        machine.lightsleep(min(ms, self.max_sleep_ms))
+        end = time.ticks_ms()
+        self.slept_ms += time.ticks_diff(end, start)
+        self.sleeps += 1
+        # summed up in steps, a ticks_diff over days would wrap
+        self._elapsed_ms += time.ticks_diff(end, self._last_ms)
+        self._last_ms = end
+
+    def get_awake_percent(self):
+        elapsed = self._elapsed_ms + time.ticks_diff(time.ticks_ms(), self._last_ms)
+        return 100 - self.slept_ms * 100 / elapsed if elapsed > 0 else 100
+
+    awake_percent = property(get_awake_percent)
+
+    def get_current_ma(self):
+        awake = self.awake_percent
+        return (awake * self.awake_ma + (100 - awake) * self.sleep_ma) / 100
+
+    current_ma = property(get_current_ma)
+
+    def reset(self):
+        self._last_ms = time.ticks_ms()
+        self._elapsed_ms = 0
+        self.slept_ms = 0
+        self.sleeps = 0
+
+    def dump(self):
+        print("CPU awake: " + str(round(self.awake_percent, 1)) + " % (" + str(self.sleeps) +
+              " light sleeps), estimated " + str(round(self.current_ma, 1)) + " mA")
@@ -1,29 +1,52 @@
 
-from machine import PWM, Pin, Timer
 import time
+_BOOT_TICKS_MS = time.ticks_ms()  # boot-to-first-frame is measured from here, the imports below included
+
+from machine import PWM, Pin, Timer
+import machine
 import math
-import network
 import sys
+import select
 import micropython
-from dht import DHT22
 
 #referred files:
 from config import Settings
-from debounce import Button
+from debounce import Buttons, PRESS, RELEASE, LONG
+from events import EventQueue
+from idle import IdleHandler
 from alarmhandler import AlarmHandler
 from display import DisplayHandler, Wheel
+from sensor import SensorHandler
 from timesync import TimeSync
+from timerwheel import TimerWheel
+from runtime import ThreadSafeFlag, create_task, idle_ms, run, sleep_ms
+import stats
 
 class MatriClock:  # *****************************************************************************************************************
 
     def __init__(self):
 
+        self._timers = TimerWheel()  # all deadlines, run by main()
         self._hdisp = DisplayHandler()
-        self._dht22 = DHT22(Pin(14, Pin.IN, Pin.PULL_UP))
+        # the sensor and its history buffers only if there is a sensor
+        if Settings.use_dht_sensor:
+            self._sensor = SensorHandler(14)
+            self._sensor_flag = ThreadSafeFlag()
+            self._sensor_timer = self._timers.add(self._sensor_flag.set, self._sensor.interval_ms)
+        else:
+            self._sensor = None
         self.rtc = machine.RTC()
-        self._timesync = TimeSync(self.rtc)
+        self._timesync = TimeSync(self.rtc, self._timers)
         
-        self.rtc.datetime((2022, 1, 1, 6, 12, 0, 0, 0))
+        # the last known time until the first sync
+        if not self._timesync.restore():
+            self.rtc.datetime((2022, 1, 1, 6, 12, 0, 0, 0))
+
+        # fast boot shows the time right away instead of the self test
+        try:
+            self._fast_boot = Settings.fast_boot
+        except AttributeError:
+            self._fast_boot = True
 
         self.bn0 = 21  # left
         self.bn1 = 22  # middle
@@ -33,39 +56,34 @@ class MatriClock:  # ***********************************************************
 
         self._alarm_dt = None
 
-        self.alh = AlarmHandler(self.rtc)
+        self.alh = AlarmHandler(self.rtc, self._timers)
         self.alarm_enabled = True
+        self._minute_flag = ThreadSafeFlag()
+        self._minute_timer = self._timers.add(self._minute_flag.set)
+
+        self._idle = IdleHandler()
+        if __debug__:
+            stats.register(self._idle)
+            stats.register(self._hdisp.trajectories)
+            if self._hdisp.renderer is not None:
+                stats.register(self._hdisp.renderer)
 
         self._mode = 'None'
         self._mode_before = 'None'
 
         self.abuzzer = Pin(28, Pin.OUT)
 
-        buttons = []
-        for id in self._ids:
-            buttons.append(Button(id, self.bn_hdl))
-
-        self._buttons = tuple(buttons)
+        # the buttons only queue their events, input_task handles them
+        self.buttons_enabled = False
+        self._events = EventQueue()
+        self._buttons = Buttons(self._ids, self._events)
 
+        # two letters per day of week, Monday first, as named in fonts/glyphs.txt
         if Settings.language == 'de':
-            self._weekday_chars = (
-                (13, 15),
-                (11, 14),
-                (13, 14),
-                (11, 15),
-                (12, 16),
-                (14, 11),
-                (14, 15))
+            self._weekday_names = ('Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So')
 
         elif Settings.language == 'en':
-            self._weekday_chars = (
-                (13, 15),
-                (15, 17),
-                (16, 12),
-                (15, 13),
-                (12, 16),
-                (14, 11),
-                (14, 17))
+            self._weekday_names = ('Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su')
 
     def my_round(self, n, ndigits):
         # Necessary because Python 3 is rounding using round-to-even according to IEE754
@@ -115,52 +133,50 @@ class MatriClock:  # ***********************************************************
 
     alarm_enabled = property(_get_alarm_enabled, _set_alarm_enabled)
 
-    def mode_temp(self):
-        if self.mode == 'temp':
-            self._dht22.measure()
-            print("temperature=" + str(self._dht22.temperature()))
-            print("humidity=" + str(self._dht22.humidity()))
+    def values(self):
+        # what the display layouts show, see DisplayHandler.chars_of()
+        now_rtcdt = self.rtc.datetime()
+        values = {'H': now_rtcdt[4], 'M': now_rtcdt[5], 'S': now_rtcdt[6],
+                  'D': now_rtcdt[2], 'W': self._weekday_names[now_rtcdt[3]]}
 
+        # cached values of sensor_task
+        if self._sensor is not None and self._sensor.temperature is not None:
             if Settings.temperature_unit == 'C':
-                temp = int(self.my_round(self._dht22.temperature(), 0))
+                temp = int(self.my_round(self._sensor.temperature, 0))
             elif Settings.temperature_unit == 'F':
-                temp = int(self.my_round(self._dht22.temperature() * 1.8 + 32, 0))
+                temp = int(self.my_round(self._sensor.temperature * 1.8 + 32, 0))
             
             if temp > 99:
                 temp = 99
 
-            t1 = temp // 10
-            t0 = temp % 10
-
-            humidity = int(self.my_round(self._dht22.humidity(), 0))
+            humidity = int(self.my_round(self._sensor.humidity, 0))
             if humidity > 99:
                 humidity = 99
 
-            h1 = humidity // 10
-            h0 = humidity % 10
-
-            if t1 == 0:
-                t1 = 10
+            values['T'] = temp
+            values['R'] = humidity
+        return values
 
-            chars = [t1, t0, 2, h1, h0]
+    def mode_temp(self):
+        if self.mode == 'temp':
+            if self._sensor is None:
+                return
+            # measured right away only before the first sample of sensor_task
+            if self._sensor.temperature is None and not self._sensor.sample():
+                return
+            print("temperature=" + str(self._sensor.temperature))
+            print("humidity=" + str(self._sensor.humidity))
+
+            chars = self._hdisp.chars_of('temp', self.values())
             self._hdisp.wheels_move_to(chars, show_alarm_enabled=False, show_time_sync_failed=False)
 
     def mode_date(self):
         if self.mode == 'date':
-            now_rtcdt = self.rtc.datetime()
-            day = now_rtcdt[2]
-            weekday = now_rtcdt[3]
-
-            d1 = day // 10
-            d0 = day % 10
-
-            wdc = self._weekday_chars[weekday]
-
-            chars = [wdc[0], wdc[1], 0, d1, d0]
+            chars = self._hdisp.chars_of('date', self.values())
             self._hdisp.wheels_move_to(chars, show_alarm_enabled=False, show_time_sync_failed=False)
 
     def mode_standby(self):
-        self._hdisp.wheels_move_to([10, 10, 0, 10, 10], show_alarm_enabled=False, show_time_sync_failed=False)
+        self._hdisp.wheels_move_to(self._hdisp.blank_chars(), show_alarm_enabled=False, show_time_sync_failed=False)
 
     def mode_buttontest(self):
         print("mode_buttontest()")
@@ -168,7 +184,7 @@ class MatriClock:  # ***********************************************************
 
         self._hdisp.disp.fill(0)
         for bnid in range(0, 5):
-            if self._buttons[bnid].value():
+            if self._buttons.value(bnid):
                 self._hdisp.disp.rect(pos[bnid][0], pos[bnid][1], 2, 2, 1)
 
         self._hdisp.show()
@@ -180,156 +196,221 @@ class MatriClock:  # ***********************************************************
 
             self._hdisp.set_brightness_from_time(now_rtcdt)
 
-            hours = now_rtcdt[4]
-            minutes = now_rtcdt[5]
-
-            h1 = hours // 10
-            h0 = hours % 10
-
-            m1 = minutes // 10
-            m0 = minutes % 10
-
-            if h1 == 0 and not Settings.leading_zero:
-                h1 = 10
-
-            self._hdisp.wheels_move_to([h1, h0, 1, m1, m0], show_alarm_enabled=True, show_time_sync_failed=True)
-
-    def wificonnect(self):
-        print("wificonnect()...")
-        self.wlan = network.WLAN(network.STA_IF)
-        self.wlan.active(False)
-        self.wlan.active(True)
-        
-        if not Settings.network_use_dhcp:
-            self.wlan.ifconfig((Settings.network_ipaddress,
-                Settings.network_subnetmask,
-                Settings.network_gateway,
-                Settings.network_dnsserver))
-
-        self.wlan.connect(Settings.wifi_ssid, Settings.wifi_password)
-
-        print("ifconfig=", self.wlan.ifconfig())
-        
-        passes = 0
-        cont = True
-        while cont:
-            passes += 1
-            cont = not self.wlan.isconnected() and passes < 30
-            print("WLAN: Waiting to connect, pass " + str(passes) +
-                  ", status=" + str(self.wlan.status()) + ", isconnected()=" + str(self.wlan.isconnected()))
-            time.sleep(0.5)
+            chars = self._hdisp.chars_of('clock', self.values())
+            self._hdisp.wheels_move_to(chars, show_alarm_enabled=True, show_time_sync_failed=True)
 
     def beep(self, duration_s):
         self.abuzzer.value(1)
         time.sleep(duration_s)
         self.abuzzer.value(0)
 
-    def beepnum(self, count):
+    async def beep_async(self, duration_ms):
+        self.abuzzer.value(1)
+        await sleep_ms(duration_ms)
+        self.abuzzer.value(0)
+
+    async def beepnum(self, count):
         for nr in range(0, count):
-            self.beep(0.03)
-            time.sleep(0.15)
+            await self.beep_async(30)
+            await sleep_ms(150)
 
     def selftest(self):
         self._hdisp.disp.fill(1)
-        self._hdisp.disp.show()
+        self._hdisp.show()
         self.beep(0.05)
         time.sleep(1)
         self._hdisp.disp.fill(0)
-        self._hdisp.disp.show()
+        self._hdisp.show()
 
     def PinId(self, pin):
         return int(str(pin)[4:6].rstrip(","))
 
-    def _get_button(self, pin):
-        for button in self._buttons:
-            if button.pin == pin:
-                return button
-        return None
-
     def speedtest(self):
         start = time.ticks_ms()
-        self._hdisp.wheels_move_to([0, 0, 0, 0, 0], show_alarm_enabled=True, show_time_sync_failed=True)
-        self._hdisp.wheels_move_to([5, 5, 0, 5, 5], show_alarm_enabled=True, show_time_sync_failed=True)
+        for digit in (0, 5):
+            values = {'H': digit * 11, 'M': digit * 11, 'S': digit * 11, 'D': digit * 11, 'W': 'Mo', 'T': digit * 11, 'R': digit * 11}
+            self._hdisp.wheels_move_to(self._hdisp.chars_of('clock', values), show_alarm_enabled=True, show_time_sync_failed=True)
         end = time.ticks_ms()
         print("stopwatch", end-start)
 
     def start(self):
         self.buttons_enabled = False
-        self.selftest()
-        self.mode = 'clock'
-        self.buttons_enabled = True
-        self.minute_loop()
+        self.boot()
+        run(self.main())
+
+    def boot(self):
+        if self._fast_boot:
+            self.show_first_frame()
+        else:
+            self.selftest()
 
-    def sleep_until_second(self, second):
+    def show_first_frame(self):
+        # The time in a single frame, main() starts the clock from there
         rtcdt = self.rtc.datetime()
-        sleep_seconds = second-rtcdt[6]
-        if sleep_seconds <= 0:
-            sleep_seconds = 60 + sleep_seconds
-        print("sleeping for " + str(sleep_seconds) + " seconds...")
-        for secs in range(0, sleep_seconds):
+        self._hdisp.set_brightness_from_time(rtcdt)
+        self._hdisp.wheels_set(self._hdisp.chars_of('clock', self.values()), show_alarm_enabled=True,
+                               show_time_sync_failed=True)
+        self._hdisp.flush()
+        boot_ms = time.ticks_diff(time.ticks_ms(), _BOOT_TICKS_MS)
+        print("boot: first frame after " + str(boot_ms) + " ms (ticks_ms " + str(time.ticks_ms()) + ")")
+        if __debug__:
+            stats.boot_ms.add(boot_ms)
+
+    async def main(self):
+        self._events.clear()  # presses during the self test
+        self.buttons_enabled = True
+        create_task(self._timers.run())
+        create_task(self.input_task())
+        create_task(self._hdisp.animate())
+        self.mode = 'clock'
+        create_task(self.alarm_task())
+        create_task(self.sync_task())
+        if Settings.use_dht_sensor:
+            create_task(self.sensor_task())
+        if self._idle.enabled:
+            create_task(self.idle_task())
+        elif __debug__:
+            create_task(self.serial_task())  # USB serial doesn't survive light sleep
+        await self.clock_task()
+
+    async def clock_task(self):
+        minute_shown = -1
+        while True:
+            rtcdt = self.rtc.datetime()
+            if rtcdt[5] != minute_shown:
+                if __debug__:
+                    stats.minute_late_ms.add(rtcdt[6] * 1000)
+                # a step can change the minute (-1 s at hh:mm:00), the display and
+                # the timer below go by the corrected time
+                if self._timesync.correct_drift() != 0:
+                    rtcdt = self.rtc.datetime()
+                minute_shown = rtcdt[5]
+                print("clock_task at " +
+                      str(rtcdt[4]) + ":" + str(rtcdt[5]) + ":" + str(rtcdt[6]))
+                self.mode_clock()
+                if minute_shown == 0:
+                    self._timesync.save()  # hourly, so the saved time is at most an hour old
+
+                if self.alh.alarm_next_remaining_seconds() <= 1:
+                    self.alh.snooze_first()
+                    self.mode = 'clock'
+
+            elif self._hdisp.seconds_shown:
+                self.mode_clock()
+
+            # until the next minute (second) begins, the RTC has no sub-seconds
+            if self._hdisp.seconds_shown:
+                self._timers.start(self._minute_timer, 1000)
+            else:
+                self._timers.start(self._minute_timer, (60 - rtcdt[6]) * 1000)
+            await self._minute_flag.wait()
+
+    async def alarm_task(self):
+        while True:
             if self.alh.alarm_reached:
                 if self.alh.alarm_auto_stop_reached:
                     self.alh.snooze_stop()
                 else:
-                    self.beepnum(4)
-                    time.sleep(0.4)
+                    await self.beepnum(4)
+                    await sleep_ms(400)
             else:
-                time.sleep(1)
+                await self.alh.flag.wait()
 
-    def minute_loop(self):
+    async def sync_task(self):
+        # The time sync runs in small steps, so clock and alarm keep going during a sync
         while True:
-            rtcdt = self.rtc.datetime()
-            print("minute_loop at " +
-                  str(rtcdt[4]) + ":" + str(rtcdt[5]) + ":" + str(rtcdt[6]))
-            # Sync time if it hasn't been synced before or if it is after 2 a.m. and the last sync is a day ago:
-            if self._timesync.necessary:
-                print(self._timesync.synced_last_rtcdt, rtcdt)
-                self.wificonnect()
-                self._timesync.time_sync()
+            wait_ms = self._timesync.poll()
+            if self._timesync.finished():
                 self._hdisp.time_sync_failed = not self._timesync.synced
+                if self._timesync.synced:
+                    self._timesync.save()
                 self.alh.set_alarm_next_rtcdt()
-                
-            self.mode_clock()
-
-            if self.alh.alarm_next_remaining_seconds() <= 1:
-                self.alh.snooze_first()
-                self.mode = 'clock'
-
-            self.sleep_until_second(0)
+                self.mode_clock()
+            await sleep_ms(wait_ms)
 
-            if self.mode == 'temp':
+    async def idle_task(self):
+        # Tickless idle, see IdleHandler
+        idle = self._idle
+        while True:
+            wait_ms = idle_ms()
+            if wait_ms is None:
+                wait_ms = idle.max_sleep_ms
+            if wait_ms >= idle.min_sleep_ms and not self.busy():
+                idle.sleep(wait_ms)
+                wait_ms = 0
+            await sleep_ms(min(wait_ms, 1000))
+
+    def busy(self):
+        # No light sleep while SPI frames, the WLAN, the button sampling or the buzzer need the clocks
+        return self._hdisp.playing or self._timesync.running or self._buttons.running or self.alh.alarm_reached
+
+    async def serial_task(self):
+        # "s" over the serial connection prints the statistics, "r" resets them,
+        # "h" prints the sensor history
+        poll = select.poll()
+        poll.register(sys.stdin, select.POLLIN)
+        while True:
+            if poll.poll(0):
+                command = sys.stdin.read(1)
+                if command == 's':
+                    stats.dump()
+                elif command == 'r':
+                    stats.reset()
+                elif command == 'h' and self._sensor is not None:
+                    self._sensor.print_history()
+                elif command == '':
+                    return  # stdin closed
+            await sleep_ms(200)
+
+    async def sensor_task(self):
+        self._timers.start(self._sensor_timer, 0)  # then every interval_ms
+        while True:
+            await self._sensor_flag.wait()
+            if self._sensor.sample() and self.mode == 'temp':
                 self.mode_temp()  # refresh temperature and humidity display
 
-    def bn_hdl(self, pin):
-        if self.buttons_enabled and not self._hdisp.playing:
-
-            button = self._get_button(pin)
-            button.register_value()
-
-            if button.value_changed() and button.value():
+    async def input_task(self):
+        events = self._events
+        while True:
+            await events.flag.wait()
+            while events.pending():
+                id, event, ticks_us = events.pop()
+                if __debug__:
+                    stats.input_latency_us.add(time.ticks_diff(time.ticks_us(), ticks_us))
+                self.bn_hdl(id, event)
+
+    def bn_hdl(self, id, event):
+        # PRESS comes right away, also for the first press of a LONG or DOUBLE press,
+        # which are free for further functions
+        if self.buttons_enabled:
+
+            if event != PRESS and event != RELEASE:
+                print("button.id = " + str(id) + (", long press" if event == LONG else ", double press"))
+
+            if event == PRESS:
                 self.beep(0.001)
                 print("alarm = " + str(self.alh.alarm_reached), ", button.id = " +
-                      str(button.id) + ", mode = " + self.mode)
+                      str(id) + ", mode = " + self.mode)
 
                 if self.alh.alarm_reached:
-                    if button.id == self.bn1 and self.mode in ('clock', 'standby', 'date', 'temp'):
+                    if id == self.bn1 and self.mode in ('clock', 'standby', 'date', 'temp'):
                         self.alh.snooze_next()
-                    elif button.id == self.bn2 and self.mode in ('clock', 'standby'):
+                    elif id == self.bn2 and self.mode in ('clock', 'standby'):
                         self.alh.snooze_stop()
                 else:
-                    if button.id == self.bn0:
+                    if id == self.bn0:
                         if self.mode in ('clock', 'standby'):
                             self.action_date()
                         elif self.mode == 'date' and Settings.use_dht_sensor:
                             self.action_temp()
                         elif self.mode == 'temp' or (self.mode == 'date' and not Settings.use_dht_sensor):
                             self.action_clock()
-                    elif button.id == self.bn1:
+                    elif id == self.bn1:
                         if self.mode == 'standby':
                             self.action_clock()
                         elif self.mode in ('clock', 'date', 'temp'):
                             self.action_standby()
-                    elif button.id == self.bn2:
+                    elif id == self.bn2:
                         if self.mode == 'clock':
                             self.action_alarm_toggle()
 
@@ -352,4 +433,5 @@ class MatriClock:  # ***********************************************************
 
 # ---------------- Main program ----------------
 
-MatriClock().start()
\ No newline at end of file
+if __name__ == '__main__':
+    MatriClock().start()
\ No newline at end of file
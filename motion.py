@@ -0,0 +1,112 @@
+from array import array
+import math
+
+# Motion curves of the wheels. A trajectory is the offset of a wheel from its
+# start position for each frame of a move, in rows and counted in the
+# direction of the move. It ends at the distance, which is a whole number of
+# characters.
+
+# 'classic': a slow start, one row per frame and a bouncing stop,
+# the longer the distance the longer the move
+_START = (0, 0, 0, 1, 0, 0, 0, 1, 0,
+          0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 1, 0)
+_STOP = (1, 1, 1, 0, 1, 0, 0, 1, 0, -1, 0, 0, -1, 0,
+         0, -1, 0, 0, -1, 0, 0, 0, -1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, -1)
+_START_STEPS = sum(_START)
+
+
+def _classic(distance, frames):
+    offsets = []
+    offset = 0
+    for step in _START:
+        offset += step
+        offsets.append(offset)
+    for frame in range(0, distance - _START_STEPS):
+        offset += 1
+        offsets.append(offset)
+    for step in _STOP:
+        offset += step
+        offsets.append(offset)
+    return offsets
+
+
+def _ease(t):
+    # cubic ease-in-out
+    if t < 0.5:
+        return 4 * t * t * t
+    t = 2 - 2 * t
+    return 1 - t * t * t / 2
+
+
+def _spring(t):
+    # ease-out that swings about 10 % past the target and settles back
+    t -= 1
+    return 1 + 2.70158 * t * t * t + 1.70158 * t * t
+
+
+def _curve(function):
+    # trajectory of frames frames whatever the distance
+    def offsets(distance, frames):
+        return [int(math.floor(distance * function((frame + 1) / frames) + 0.5)) for frame in range(0, frames)]
+    return offsets
+
+
+_CURVES = {
+    'classic': _classic,
+    'ease': _curve(_ease),
+    'spring': _curve(_spring),
+}
+
+
+class Trajectories:
+
+    # Bounded cache of the trajectories, so that a move that happens again
+    # (the minute wheel rolls by one character every minute) costs a lookup.
+    #
+    # Entries are keyed by (curve, distance) and stored as array('h'). The
+    # direction only flips the sign of the offsets, the wheel applies it while
+    # playing, so both directions share an entry. When the cache is full, the
+    # least recently used entry makes room.
+
+    def __init__(self, curve='classic', frames=60, size=16):
+        if curve not in _CURVES:
+            raise ValueError("wheel_motion: no curve " + str(curve))
+        self.curve = curve
+        self.frames = frames  # frames of a move for the curves with a constant duration
+        self._size = size
+        self._cache = {}
+        self._used = {}  # key -> value of _stamp when last used
+        self._stamp = 0
+        self.reset()
+
+    def get(self, distance, curve=None):
+        # trajectory of a move by distance rows
+        if curve is None:
+            curve = self.curve
+        key = (curve, distance)
+        trajectory = self._cache.get(key)
+        if trajectory is None:
+            self.misses += 1
+            if len(self._cache) >= self._size:
+                oldest = min(self._used, key=self._used.get)
+                del self._cache[oldest]
+                del self._used[oldest]
+            trajectory = array('h', _CURVES[curve](distance, self.frames))
+            self._cache[key] = trajectory
+        else:
+            self.hits += 1
+        self._stamp += 1
+        self._used[key] = self._stamp
+        return trajectory
+
+    def clear(self):
+        self._cache = {}
+        self._used = {}
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def dump(self):
+        print("trajectories: " + str(len(self._cache)) + " cached, " + str(self.hits) + " hits, " +
+              str(self.misses) + " computed")
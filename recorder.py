@@ -0,0 +1,100 @@
+import framebuf
+
+# Recording files: _MAGIC, the width in modules, the height in modules, then
+# the frames one after the other in the MONO_HLSB layout of the framebuffer
+_MAGIC = b'MCF1'
+
+
+class FrameRecorder:
+
+    # Display driver without a display: the same framebuffer as the MAX7219
+    # driver, but show() appends the frame to a recording instead of sending it.
+    # Pass it to DisplayHandler(disp=...) to capture what the display shows,
+    # frame by frame, e.g. to check that a rendering change shows the same frames
+    # as before, or to make a GIF of a move on the PC (tools/frames.py).
+    #
+    # Frames are stored as they are in the framebuffer, one bit per LED, in a
+    # buffer allocated up front (32 bytes per frame for 4 modules), so show()
+    # doesn't allocate. Frames beyond max_frames are counted in dropped.
+
+    def __init__(self, num, rows=1, max_frames=512):
+        self.num = num
+        self.width = 8 * num // rows
+        self.height = 8 * rows
+        self.buffer = bytearray(8 * num)
+        fb = framebuf.FrameBuffer(self.buffer, self.width, self.height, framebuf.MONO_HLSB)
+        self.framebuf = fb
+        self.fill = fb.fill
+        self.pixel = fb.pixel
+        self.hline = fb.hline
+        self.vline = fb.vline
+        self.line = fb.line
+        self.rect = fb.rect
+        self.fill_rect = fb.fill_rect
+        self.text = fb.text
+        self.scroll = fb.scroll
+        self.blit = fb.blit
+
+        self._frames = bytearray(max_frames * len(self.buffer))
+        self.count = 0
+        self.dropped = 0
+        self.level = 0  # brightness
+
+    def brightness(self, value):
+        if not 0 <= value <= 15:
+            raise ValueError("Brightness out of range")
+        self.level = value
+
+    def invalidate(self):
+        pass
+
+    def show(self, buf=None):
+        # records buf, by default the framebuffer
+        if buf is None:
+            buf = self.buffer
+        size = len(self.buffer)
+        start = self.count * size
+        if start + size > len(self._frames):
+            self.dropped += 1
+            return
+        self._frames[start:start + size] = buf
+        self.count += 1
+
+    def frame(self, n):
+        # frame n of the recording
+        size = len(self.buffer)
+        return memoryview(self._frames)[n * size:(n + 1) * size]
+
+    def clear(self):
+        # starts a new recording
+        self.count = 0
+        self.dropped = 0
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(_MAGIC + bytes((self.width // 8, self.height // 8)))
+            f.write(memoryview(self._frames)[:self.count * len(self.buffer)])
+
+    def compare(self, path):
+        # Compares the recording with the one in the file, returns None if they match, else
+        # the number of the first frame that differs (the shorter length if one is a prefix)
+        width, height, frames = load(path)
+        if (width, height) != (self.width, self.height):
+            raise ValueError(path + ": recorded on " + str(width) + "x" + str(height))
+        size = len(self.buffer)
+        count = len(frames) // size
+        for n in range(0, min(count, self.count)):
+            if frames[n * size:(n + 1) * size] != self._frames[n * size:(n + 1) * size]:
+                return n
+        if count != self.count:
+            return min(count, self.count)
+        return None
+
+
+def load(path):
+    # (width, height, frames) of a recording file
+    with open(path, 'rb') as f:
+        header = f.read(len(_MAGIC) + 2)
+        if header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(path + ": no frame recording")
+        return 8 * header[-2], 8 * header[-1], f.read()
@@ -0,0 +1,89 @@
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+
+class Renderer:
+
+    # Sends the frames to the display from the second core of the RP2040.
+    #
+    # Core 0 draws a frame into the driver's buffer (the back buffer) and calls
+    # submit(), which copies it into the front buffer and hands that to core 1.
+    # Core 1 sends the front buffer over SPI while core 0 draws the next frame,
+    # so drawing frame N+1 overlaps with the transfer of frame N and the
+    # asyncio tasks on core 0 don't wait for the SPI.
+    #
+    # Two locks hand the front buffer over: _free is held while it holds a frame
+    # not sent yet, _ready while there is nothing to send. A frame is never
+    # overwritten before it is sent, submit() waits for core 1 instead (at most
+    # one transfer). Anything else using the SPI has to flush() first.
+    #
+    # There is only one core 1, so all renderers share one thread and the locks,
+    # e.g. for the displays bench.py creates one after the other.
+    #
+    # _thread is the same under CPython, so the renderer also runs in the simulator.
+
+    available = _thread is not None
+
+    _free = None
+    _ready = None
+    _job = None  # the renderer whose front buffer is sent next
+
+    def __init__(self, disp):
+        self._disp = disp
+        self._front = bytearray(len(disp.buffer))
+        self._invalidate = False  # set on core 0, passed along with the next frame
+        self._front_invalidate = False
+        self.reset()
+
+        if Renderer._free is None:
+            Renderer._free = _thread.allocate_lock()
+            Renderer._ready = _thread.allocate_lock()
+            Renderer._ready.acquire()
+            _thread.start_new_thread(_run, ())
+
+    def submit(self):
+        # Queues the frame in the driver's buffer, returns as soon as core 1 took the last one
+        if not Renderer._free.acquire(0):
+            self.waits += 1
+            Renderer._free.acquire()
+        self._front[:] = self._disp.buffer
+        self._front_invalidate = self._invalidate
+        self._invalidate = False
+        Renderer._job = self
+        Renderer._ready.release()
+
+    def invalidate(self):
+        # the next frame resends all rows
+        self._invalidate = True
+
+    def flush(self):
+        # waits until core 1 has sent the last frame
+        Renderer._free.acquire()
+        Renderer._free.release()
+
+    def _send(self):
+        # core 1
+        if self._front_invalidate:
+            self._disp.invalidate()
+        self._disp.show(self._front)
+        self.frames += 1
+
+    def reset(self):
+        self.frames = 0
+        self.waits = 0  # submit() calls waiting for core 1
+
+    def dump(self):
+        print("core 1: " + str(self.frames) + " frames sent, " + str(self.waits) + " submits waited")
+
+
+def _run():
+    # core 1
+    while True:
+        Renderer._ready.acquire()
+        try:
+            Renderer._job._send()
+        except Exception as e:
+            print("core 1:", e)
+        Renderer._free.release()
@@ -0,0 +1,77 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import sys
+import time
+
+# The parts of uasyncio matriclock relies on, with CPython asyncio fallbacks
+
+try:
+    sleep_ms = asyncio.sleep_ms
+except AttributeError:
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+try:
+    wait_for_ms = asyncio.wait_for_ms
+except AttributeError:
+    def wait_for_ms(aw, timeout):
+        return asyncio.wait_for(aw, timeout / 1000)
+
+TimeoutError = asyncio.TimeoutError
+
+try:
+    ThreadSafeFlag = asyncio.ThreadSafeFlag
+except AttributeError:
+    class ThreadSafeFlag:
+
+        def __init__(self):
+            self._event = asyncio.Event()
+
+        def set(self):
+            self._event.set()
+
+        def clear(self):
+            self._event.clear()
+
+        async def wait(self):
+            await self._event.wait()
+            self._event.clear()
+
+
+def create_task(coro):
+    return asyncio.create_task(coro)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# uasyncio can't tell when its next task is due, idle_ms() looks it up in the task
+# queue, which is internal (asyncio.core._task_queue, Task.ph_key). Only done on
+# the MicroPython versions known to have them, elsewhere idle_ms is None and the
+# clock doesn't sleep between events.
+_PEEK_VERSIONS = ((1, 13), (1, 25))  # from, up to but not including
+
+if sys.implementation.name != 'micropython':
+    def idle_ms():
+        # Time until the next sleeping task is due, 0 if a task is ready,
+        # None if all tasks wait for events (flags, streams)
+        loop = asyncio.get_event_loop()
+        if loop._ready:
+            return 0
+        for handle in sorted(loop._scheduled):
+            if not handle.cancelled():
+                return max(-int((loop.time() - handle.when()) * 1000 // 1), 0)  # rounded up
+        return None
+elif _PEEK_VERSIONS[0] <= tuple(sys.implementation.version[0:2]) < _PEEK_VERSIONS[1] \
+        and hasattr(getattr(asyncio, 'core', None), '_task_queue'):
+    def idle_ms():
+        # see above, the queue is looked up each time, new_event_loop() replaces it
+        task = asyncio.core._task_queue.peek()
+        if task is None:
+            return None
+        return max(time.ticks_diff(task.ph_key, time.ticks_ms()), 0)
+else:
+    idle_ms = None
@@ -0,0 +1,111 @@
+from machine import Pin
+from array import array
+from dht import DHT22
+import time
+
+from config import Settings
+
+
+class History:
+
+    # Ring buffer of the last size samples in an array, the oldest is overwritten
+
+    def __init__(self, size, typecode='h'):
+        self._values = array(typecode, [0] * size)
+        self._next = 0
+        self.count = 0
+
+    def add(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        if self.count < len(self._values):
+            self.count += 1
+
+    def latest(self, n=0):
+        # n-th latest sample, 0 is the latest
+        return self._values[(self._next - 1 - n) % len(self._values)]
+
+    def window(self, count):
+        # (min, max, mean) of the latest count samples, None without samples
+        count = min(count, self.count)
+        if count == 0:
+            return None
+        low = high = total = self.latest()
+        for n in range(1, count):
+            value = self.latest(n)
+            total += value
+            if value < low:
+                low = value
+            if value > high:
+                high = value
+        return low, high, total / count
+
+
+class SensorHandler:
+
+    # Samples the DHT22 on a fixed cadence from sensor_task, everything else reads
+    # the cached values. Temperature (degC) and humidity (%) are kept in tenths
+    # in the histories.
+
+    min_interval_ms = 2000  # the DHT22 fails when measured more often
+
+    def __init__(self, pin_id=14):
+        self._dht22 = DHT22(Pin(pin_id, Pin.IN, Pin.PULL_UP))
+
+        try:
+            self.interval_ms = Settings.sensor_interval_s * 1000
+        except AttributeError:
+            self.interval_ms = 60000
+        self.interval_ms = max(self.interval_ms, self.min_interval_ms)
+        try:
+            history_hours = Settings.sensor_history_hours
+        except AttributeError:
+            history_hours = 24
+        size = max(history_hours * 3600000 // self.interval_ms, 1)
+
+        self.temperature = None
+        self.humidity = None
+        self.errors = 0
+        self._sample_ticks_ms = None
+        self.temperature_history = History(size)
+        self.humidity_history = History(size, 'H')
+
+    def sample(self):
+        # Measures once unless the last measurement is too recent, returns True on success
+        now = time.ticks_ms()
+        if self._sample_ticks_ms is not None and time.ticks_diff(now, self._sample_ticks_ms) < self.min_interval_ms:
+            return False
+        self._sample_ticks_ms = now
+        try:
+            self._dht22.measure()
+        except OSError as e:
+            self.errors += 1
+            print("DHT22 OSError:", e)
+            return False
+
+        self.temperature = self._dht22.temperature()
+        self.humidity = self._dht22.humidity()
+        self.temperature_history.add(int(self.temperature * 10 + (0.5 if self.temperature >= 0 else -0.5)))
+        self.humidity_history.add(int(self.humidity * 10 + 0.5))
+        return True
+
+    def window(self, history, minutes):
+        # (min, max, mean) of history over the last minutes, in degC or %
+        stats = history.window(max(minutes * 60000 // self.interval_ms, 1))
+        if stats is None:
+            return None
+        return stats[0] / 10, stats[1] / 10, stats[2] / 10
+
+    def temperature_window(self, minutes):
+        return self.window(self.temperature_history, minutes)
+
+    def humidity_window(self, minutes):
+        return self.window(self.humidity_history, minutes)
+
+    def print_history(self, windows=(60, 1440)):
+        for minutes in windows:
+            for name, history in (("temperature", self.temperature_history), ("humidity", self.humidity_history)):
+                stats = self.window(history, minutes)
+                if stats is not None:
+                    print(name + " " + str(minutes) + " min: min=" + str(stats[0]) + ", max=" + str(stats[1]) +
+                          ", mean=" + str(round(stats[2], 1)))
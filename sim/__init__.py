@@ -0,0 +1,56 @@
+import asyncio
+import importlib
+import sys
+import time
+
+from sim import clock as _clock
+from sim.clock import VirtualClock, ticks_add, ticks_diff
+from sim.loop import VirtualEventLoopPolicy
+from sim.worldtimeapi import WorldTimeAPI
+
+# Host-side stand-ins for the Pico W hardware and MicroPython modules.
+#
+#   import sim
+#   clock = sim.install()          # before importing any matriclock module
+#   WorldTimeAPI(clock).start()
+#   import main
+#   main.MatriClock().start()      # runs in virtual time
+
+MODULES = ('machine', 'framebuf', 'max7219', 'network', 'urequests', 'usocket', 'ntptime', 'dht', 'micropython')
+
+
+def install(clock=None):
+    # Registers the stand-ins as MicroPython modules, adds the MicroPython
+    # functions to time and lets asyncio run on the virtual clock.
+    if clock is None:
+        clock = VirtualClock()
+    _clock.current = clock
+
+    time.sleep = clock.sleep
+    time.sleep_ms = clock.sleep_ms
+    time.sleep_us = clock.sleep_us
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_cpu = clock.ticks_us
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+
+    for name in MODULES:
+        sys.modules[name] = importlib.import_module('sim.' + name)
+
+    asyncio.set_event_loop_policy(VirtualEventLoopPolicy())
+    return clock
+
+
+def press(pin_id, at_s=None, duration_s=0.12, bounces=3):
+    # Presses the button on pin_id at virtual time at_s (default: now).
+    # The contact bounces a few times, 0.3 ms apart, when closing and opening.
+    from sim.machine import Pin
+    clock = _clock.current
+    if at_s is None:
+        at_s = clock.seconds()
+    start = int(at_s * 1000000)
+    for edge_us, value in ((start, 1), (start + int(duration_s * 1000000), 0)):
+        for bounce in range(0, 2 * bounces + 1):
+            level = value if bounce % 2 == 0 else 1 - value
+            clock.call_at(edge_us + bounce * 300, lambda level=level: Pin.pins[pin_id].sim_set(level))
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import os
+import sys
+import time
+
+import sim
+
+# Runs matriclock in virtual time, e.g. a simulated week:
+#   python -m sim --days 7
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sim', description='Run matriclock on simulated hardware.')
+    parser.add_argument('--days', type=float, default=7, help='virtual days to run (default: 7)')
+    parser.add_argument('--start', default='2022-10-07T02:59', metavar='YYYY-MM-DDTHH:MM',
+                        help='UTC time at the start (default: 2022-10-07T02:59), e.g. 2022-10-28T02:59 to '
+                             'run into the end of summer time')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='0 runs as fast as possible (default), 1 in real time')
+    parser.add_argument('--fail-syncs', type=int, default=0,
+                        help='number of time server requests answered with HTTP 503')
+    parser.add_argument('--drift-ppm', type=float, default=0,
+                        help='RTC drift in ppm, positive runs fast')
+    parser.add_argument('--ticks-ms', type=int, default=0,
+                        help='time.ticks_ms() at the start, ticks_ms wraps at 2**30 (about 12.4 days)')
+    parser.add_argument('--press', action='append', default=[], metavar='PIN@SECONDS[:DURATION]',
+                        help='press the button on PIN at virtual SECONDS, e.g. 21@3600 or 21@3600:1.5')
+    parser.add_argument('--time-cache', metavar='FILE',
+                        help='file the clock saves its time to and boots from (default: none)')
+    parser.add_argument('--verbose', action='store_true', help="show the clock's own output")
+    args = parser.parse_args(argv)
+
+    start = datetime.datetime.strptime(args.start, '%Y-%m-%dT%H:%M')
+    clock = sim.install(sim.VirtualClock(start=start.timetuple()[0:6], ticks_ms=args.ticks_ms, speed=args.speed))
+    clock.rtc_drift_ppm = args.drift_ppm
+    server = sim.WorldTimeAPI(clock).start()
+    server.fail_count = args.fail_syncs
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from config import Settings
+    Settings.time_cache = args.time_cache
+    import main as matriclock
+
+    for press in args.press:
+        pin_id, at_s = press.split('@')
+        at_s, duration_s = (at_s + ':0.12').split(':')[0:2]
+        sim.press(int(pin_id), float(at_s), float(duration_s))
+
+    beeps = []
+
+    async def run():
+        try:
+            await asyncio.wait_for(app.main(), args.days * 86400)
+        except asyncio.TimeoutError:
+            pass
+
+    wall_start = time.monotonic()
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            app = matriclock.MatriClock()
+            buzzer = sim.machine.Pin.pins[28]
+            buzzer.listeners.append(lambda pin: pin.value() and beeps.append(clock.seconds()))
+            app.boot()
+            asyncio.run(run())
+    wall_s = time.monotonic() - wall_start
+    app._hdisp.flush()
+
+    disp = app._hdisp.disp
+    disp.sim_chain.cols = app._hdisp.width // 8
+    print("virtual time:  " + str(round(clock.seconds() / 86400, 2)) + " days, " +
+          "wall time: " + str(round(wall_s, 1)) + " s (x" + str(int(clock.seconds() / wall_s)) + ")")
+    print("ticks_ms:      " + str(clock.ticks_ms()) + " (" + str((clock.us // 1000 + args.ticks_ms) >> 30) + " wraps)")
+    print("reference:     " + str(clock.now()) + " UTC, RTC: " + str(clock.rtc_now()))
+    print("time requests: " + str(server.requests) + " (" + str(server.failures) + " failed)")
+    print("SPI:           " + str(disp.spi.bytes_written) + " bytes in " + str(disp.spi.writes) + " writes")
+    print("buzzer:        " + str(len(beeps)) + " beeps")
+    print(disp.sim_chain.ascii())
+    if __debug__:
+        import stats
+        stats.dump()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
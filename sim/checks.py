@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+
+import sim
+from sim.clock import TICKS_PERIOD, VirtualClock
+
+# Scripted checks in virtual time, each raises AssertionError when it fails:
+#   python -m sim.checks
+
+
+def timer_wraps(wraps=3):
+    # The alarm and time sync deadlines on a TimerWheel, day after day, until
+    # ticks_ms has wrapped wraps times (the first wrap a minute after the start).
+    # Every timer has to fire on the tick it is due, a stopped one never, and the
+    # periodic minute timer must not drift.
+    clock = sim.install(VirtualClock(ticks_ms=TICKS_PERIOD - 60000))
+    from config import Settings
+    from timerwheel import TimerWheel
+
+    wheel = TimerWheel()
+    due = {}  # name -> ticks_ms it has to fire on
+    fired = {}
+    periods = {}
+
+    def add(name, period_ms=0):
+        def expired():
+            now = time.ticks_ms()
+            assert name in due, name + " fired while stopped, at " + str(now)
+            assert now == due[name], name + " fired at " + str(now) + " instead of " + str(due[name])
+            fired[name] = fired.get(name, 0) + 1
+            if periods.get(name):
+                due[name] = time.ticks_add(now, periods[name])
+            else:
+                del due[name]
+        periods[name] = period_ms
+        return wheel.add(expired, period_ms)
+
+    def start(id, name, delay_ms):
+        wheel.start(id, delay_ms)
+        due[name] = time.ticks_add(time.ticks_ms(), delay_ms)
+
+    def stop(id, name):
+        wheel.stop(id)
+        due.pop(name, None)
+
+    def run(ms):
+        # like TimerWheel.run(), for ms of virtual time
+        end_us = clock.us + ms * 1000
+        while True:
+            now = time.ticks_ms()
+            wheel.expire(now)
+            if clock.us >= end_us:
+                break
+            wait_ms = wheel.next_ms(now)
+            assert wait_ms != 0, "a due timer is left after expire()"
+            left_ms = (end_us - clock.us) // 1000
+            clock.advance(min(wait_ms if wait_ms is not None else left_ms, left_ms) / 1000)
+        for name in due:
+            assert time.ticks_diff(due[name], time.ticks_ms()) > 0, name + " didn't fire"
+
+    snooze = add('snooze')
+    auto_stop = add('auto stop')
+    retry = add('sync retry')
+    minute = add('minute', 60000)
+    auto_stop_ms = Settings.alarm_auto_stop_m * 60000
+    snooze_ms = Settings.snooze_time_m * 60000
+    retry_ms = 600000  # TimeSync.retry_ms
+
+    start(minute, 'minute', 60000)
+    wrapped = 0
+    days = 0
+    last = time.ticks_ms()
+    while wrapped < wraps:
+        day_us = clock.us
+
+        # a failed sync waits retry_ms, the next one is cancelled by a successful sync
+        start(retry, 'sync retry', retry_ms)
+        run(retry_ms + 1000)
+        start(retry, 'sync retry', retry_ms)
+        run(1000)
+        stop(retry, 'sync retry')
+
+        # the alarm rings, snooze after 20 s, it rings again and stops by itself
+        start(auto_stop, 'auto stop', auto_stop_ms)
+        run(20000)
+        stop(auto_stop, 'auto stop')
+        start(snooze, 'snooze', snooze_ms)
+        run(snooze_ms)
+        start(auto_stop, 'auto stop', auto_stop_ms)
+        run(auto_stop_ms + 1000)
+
+        run(86400000 - (clock.us - day_us) // 1000)
+        days += 1
+        now = time.ticks_ms()
+        if now < last:
+            wrapped += 1
+        last = now
+
+    assert fired['sync retry'] == days, fired
+    assert fired['snooze'] == days, fired
+    assert fired['auto stop'] == days, fired
+    assert fired['minute'] == days * 1440, fired
+    return str(days) + " days, " + str(wrapped) + " wraps, " + str(sum(fired.values())) + " timers fired"
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for check in (timer_wraps,):
+        print(check.__name__ + ": " + check())
+
+
+if __name__ == '__main__':
+    main()
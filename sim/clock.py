@@ -0,0 +1,143 @@
+import datetime
+import heapq
+import math
+import threading
+import time
+
+# MicroPython ticks are small ints and wrap at 2**30
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+_real_sleep = time.sleep
+
+current = None  # the VirtualClock installed by sim.install()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+class _Event:
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+
+    # Virtual time for the simulator. Time only passes when the simulated code
+    # sleeps, waits in the event loop or spends time on (simulated) hardware,
+    # so a week of clock operation does not take a week.
+    #
+    # start:    UTC date and time of the reference clock (the "real" time) at us=0
+    # ticks_ms: value of time.ticks_ms() at us=0, e.g. close to a wrap
+    # speed:    0 runs as fast as possible, 1 in real time, 10 ten times faster
+
+    def __init__(self, start=(2022, 10, 7, 2, 59, 0), ticks_ms=0, speed=0):
+        self.us = 0
+        self.start = datetime.datetime(*start)
+        self.speed = speed
+        self._ticks_offset_us = ticks_ms * 1000
+        self._events = []
+        self._seq = 0
+
+        self._thread = threading.get_ident()  # core 0, other threads run on core 1
+        self.sleep_us = 0  # virtual time spent in sleep()
+        self.irq_count = 0
+
+        # The board's RTC runs on its own crystal, drift_ppm > 0 runs fast
+        self.rtc_drift_ppm = 0
+        self._rtc_base = datetime.datetime(2021, 1, 1)
+        self._rtc_base_us = 0
+
+    # ---- reference time ----
+
+    def now(self):
+        # UTC date and time of the reference clock
+        return self.start + datetime.timedelta(microseconds=self.us)
+
+    def seconds(self):
+        return self.us / 1000000
+
+    # ---- MicroPython time functions ----
+
+    def ticks_ms(self):
+        return ((self.us + self._ticks_offset_us) // 1000) & TICKS_MAX
+
+    def ticks_us(self):
+        return (self.us + self._ticks_offset_us) & TICKS_MAX
+
+    def sleep(self, seconds, wake_on_irq=False):
+        start = self.us
+        self.advance(seconds, wake_on_irq)
+        self.sleep_us += self.us - start
+
+    def sleep_ms(self, ms):
+        self.sleep(ms / 1000)
+
+    def sleep_us(self, us):
+        self.sleep(us / 1000000)
+
+    # ---- board RTC ----
+
+    def rtc_now(self):
+        elapsed = self.us - self._rtc_base_us
+        return self._rtc_base + datetime.timedelta(
+            microseconds=elapsed + elapsed * self.rtc_drift_ppm // 1000000)
+
+    def rtc_set(self, dt):
+        self._rtc_base = dt
+        self._rtc_base_us = self.us
+
+    # ---- simulated events ----
+
+    def call_at(self, us, callback):
+        event = _Event(callback)
+        heapq.heappush(self._events, (max(us, self.us), self._seq, event))
+        self._seq += 1
+        return event
+
+    def call_later(self, seconds, callback):
+        return self.call_at(self.us + math.ceil(seconds * 1000000), callback)
+
+    def next_event_us(self):
+        while self._events and self._events[0][2].cancelled:
+            heapq.heappop(self._events)
+        return self._events[0][0] if self._events else None
+
+    def advance(self, seconds, wake_on_irq=False):
+        # Lets virtual time pass, running the events that fall due on the way.
+        # With wake_on_irq, returns early after an event raised a pin IRQ.
+        target = self.us + math.ceil(seconds * 1000000)
+        while True:
+            when = self.next_event_us()
+            if when is None or when > target:
+                break
+            event = heapq.heappop(self._events)[2]
+            self._move_to(when)
+            irq_count = self.irq_count
+            event.callback()
+            if wake_on_irq and self.irq_count != irq_count:
+                return
+        self._move_to(target)
+
+    def busy(self, seconds):
+        # time the CPU or a peripheral spends working, e.g. an SPI transfer.
+        # Work on core 1 runs alongside core 0 and takes no virtual time.
+        if threading.get_ident() == self._thread:
+            self.advance(seconds)
+
+    def _move_to(self, us):
+        if us > self.us:
+            if self.speed:
+                _real_sleep((us - self.us) / 1000000 / self.speed)
+            self.us = us
@@ -0,0 +1,44 @@
+import math
+
+from sim import clock as _clock
+
+
+def _indoor(seconds):
+    # a slow daily swing around 21 degC / 45 %rH
+    phase = math.sin(2 * math.pi * (seconds / 86400 - 0.3))
+    return 21.0 + 2.0 * phase, 45.0 - 5.0 * phase
+
+
+class DHT22:
+
+    model = staticmethod(_indoor)  # seconds of virtual time -> (degC, %rH)
+    read_time_s = 0.005
+    min_interval_s = 2.0  # measuring more often fails like the real sensor
+
+    def __init__(self, pin):
+        self.pin = pin
+        self._last_us = None
+        self._temperature = 0.0
+        self._humidity = 0.0
+        self.measurements = 0
+
+    def measure(self):
+        clock = _clock.current
+        clock.busy(DHT22.read_time_s)
+        if self._last_us is not None and clock.us - self._last_us < DHT22.min_interval_s * 1000000:
+            raise OSError(110)  # ETIMEDOUT
+        self._last_us = clock.us
+        self.measurements += 1
+        temperature, humidity = DHT22.model(clock.seconds())
+        self._temperature = round(temperature, 1)
+        self._humidity = round(humidity, 1)
+
+    def temperature(self):
+        return self._temperature
+
+    def humidity(self):
+        return self._humidity
+
+
+class DHT11(DHT22):
+    pass
@@ -0,0 +1,99 @@
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+
+    # Stand-in for MicroPython's framebuf, monochrome formats only.
+    # text() does not use the MicroPython font, characters are drawn as a
+    # pattern derived from their character code.
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (MONO_HLSB, MONO_HMSB, MONO_VLSB):
+            raise ValueError("format not supported by the simulator")
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+
+    def _index(self, x, y):
+        if self.format == MONO_VLSB:
+            return (y >> 3) * self.stride + x, 1 << (y & 7)
+        if self.format == MONO_HLSB:
+            return (y * self.stride + x) >> 3, 0x80 >> (x & 7)
+        return (y * self.stride + x) >> 3, 1 << (x & 7)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i, bit = self._index(x, y)
+        if c is None:
+            return 1 if self.buffer[i] & bit else 0
+        if c:
+            self.buffer[i] |= bit
+        else:
+            self.buffer[i] &= ~bit & 0xFF
+
+    def fill(self, c):
+        val = 0xFF if c else 0x00
+        for i in range(len(self.buffer)):
+            self.buffer[i] = val
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)):
+            for xx in range(max(x, 0), min(x + w, self.width)):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+        else:
+            self.hline(x, y, w, c)
+            self.hline(x, y + h - 1, w, c)
+            self.vline(x, y, h, c)
+            self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        steps = max(abs(x2 - x1), abs(y2 - y1), 1)
+        for step in range(steps + 1):
+            self.pixel(x1 + (x2 - x1) * step // steps, y1 + (y2 - y1) * step // steps, c)
+
+    def text(self, s, x, y, c=1):
+        for n, char in enumerate(s):
+            if char == ' ':
+                continue
+            code = ord(char)
+            for row in range(1, 7):
+                bits = (code * (row * 37 + 11)) >> 1 & 0x3E | 0x40
+                for col in range(0, 7):
+                    if bits & (0x40 >> col):
+                        self.pixel(x + n * 8 + col, y + row, c)
+
+    def scroll(self, xstep, ystep):
+        pixels = [[self.pixel(x, y) for x in range(self.width)] for y in range(self.height)]
+        for y in range(self.height):
+            for x in range(self.width):
+                xs = x - xstep
+                ys = y - ystep
+                if 0 <= xs < self.width and 0 <= ys < self.height:
+                    self.pixel(x, y, pixels[ys][xs])
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        # only the part that overlaps this buffer, like MicroPython
+        for yy in range(max(0, -y), min(fbuf.height, self.height - y)):
+            for xx in range(max(0, -x), min(fbuf.width, self.width - x)):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
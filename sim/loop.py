@@ -0,0 +1,44 @@
+import asyncio
+import selectors
+
+from sim import clock as _clock
+
+
+class _VirtualSelector:
+
+    # Instead of blocking until the next timer of the event loop falls due,
+    # the virtual clock jumps there.
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def select(self, timeout=None):
+        if timeout is None:
+            # nothing scheduled in the loop, run until the next simulated event
+            when = self._clock.next_event_us()
+            if when is None:
+                raise RuntimeError("simulation stalled: no task and no simulated event pending")
+            self._clock.sleep((when - self._clock.us) / 1000000, wake_on_irq=True)
+        elif timeout > 0:
+            self._clock.sleep(timeout, wake_on_irq=True)
+        return self._selector.select(0)
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self, clock):
+        self._clock = clock
+        super().__init__(_VirtualSelector(clock))
+
+    def time(self):
+        return self._clock.us / 1000000
+
+
+class VirtualEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+
+    def new_event_loop(self):
+        return VirtualEventLoop(_clock.current)
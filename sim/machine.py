@@ -0,0 +1,225 @@
+from sim import clock as _clock
+
+
+class Pin:
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    pins = {}  # id -> the last Pin created for it, so the simulator can drive inputs
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self._id = id
+        self._mode = mode
+        self._pull = pull
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        self._handler = None
+        self._trigger = 0
+        self.listeners = []  # called with the pin whenever its level changes
+        Pin.pins[id] = self
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self._mode = mode
+        if pull != -1:
+            self._pull = pull
+        if value is not None:
+            self._set(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._set(value)
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self._set(not self._value)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False, wake=None):
+        self._handler = handler
+        self._trigger = trigger
+        return self
+
+    def sim_set(self, value):
+        # drives an input pin from outside, raising the IRQ like the hardware does
+        value = 1 if value else 0
+        if value != self._value:
+            self._set(value)
+            edge = Pin.IRQ_RISING if value else Pin.IRQ_FALLING
+            if self._handler is not None and self._trigger & edge:
+                _clock.current.irq_count += 1
+                self._handler(self)
+
+    def _set(self, value):
+        value = 1 if value else 0
+        if value != self._value:
+            self._value = value
+            for listener in self.listeners:
+                listener(self)
+
+    def __repr__(self):
+        return "Pin(" + str(self._id) + ", mode=" + ("OUT" if self._mode == Pin.OUT else "IN") + ")"
+
+
+class SPI:
+
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id, baudrate=1000000, polarity=0, phase=0, bits=8, firstbit=MSB,
+                 sck=None, mosi=None, miso=None):
+        self.id = id
+        self.baudrate = baudrate
+        self.devices = []  # hardware models receiving the written bytes
+        self.bytes_written = 0
+        self.writes = 0
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        self.bytes_written += len(buf)
+        self.writes += 1
+        _clock.current.busy(len(buf) * 8 / self.baudrate)
+        for device in self.devices:
+            device.receive(buf)
+
+    def read(self, nbytes, write=0x00):
+        return bytes(nbytes)
+
+
+class RTC:
+
+    def datetime(self, datetimetuple=None):
+        # (year, month, day, weekday, hours, minutes, seconds, subseconds)
+        clock = _clock.current
+        if datetimetuple is None:
+            dt = clock.rtc_now()
+            return (dt.year, dt.month, dt.day, dt.weekday(), dt.hour, dt.minute, dt.second, 0)
+
+        import datetime
+        year, month, day, weekday, hours, minutes, seconds = datetimetuple[0:7]
+        clock.rtc_set(datetime.datetime(year, month, day, hours, minutes, seconds))
+
+
+class Timer:
+
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        self._event = None
+        if callback is not None:
+            self.init(mode=mode, period=period, freq=freq, callback=callback)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, tick_hz=1000):
+        self.deinit()
+        self._mode = mode
+        self._callback = callback
+        if freq > 0:
+            self._period_s = 1 / freq
+        else:
+            self._period_s = period / tick_hz
+        self._event = _clock.current.call_later(self._period_s, self._fire)
+
+    def _fire(self):
+        if self._mode == Timer.PERIODIC:
+            self._event = _clock.current.call_later(self._period_s, self._fire)
+        else:
+            self._event = None
+        if self._callback is not None:
+            _clock.current.irq_count += 1
+            self._callback(self)
+
+    def deinit(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+
+class PWM:
+
+    def __init__(self, pin, freq=0, duty_u16=0):
+        self._pin = pin
+        self._freq = freq
+        self._duty_u16 = duty_u16
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty_u16
+        self._duty_u16 = value
+
+    def deinit(self):
+        self._duty_u16 = 0
+
+
+_irq_state = 1
+
+
+def disable_irq():
+    global _irq_state
+    state = _irq_state
+    _irq_state = 0
+    return state
+
+
+def enable_irq(state=1):
+    global _irq_state
+    _irq_state = state
+
+
+def lightsleep(time_ms=None):
+    clock = _clock.current
+    if time_ms is None:
+        when = clock.next_event_us()
+        if when is None:
+            raise RuntimeError("lightsleep() without timeout and no simulated event pending")
+        time_ms = (when - clock.us) / 1000
+    clock.sleep(time_ms / 1000, wake_on_irq=True)
+
+
+def deepsleep(time_ms=None):
+    lightsleep(time_ms)
+    reset()
+
+
+def idle():
+    _clock.current.sleep(0.001, wake_on_irq=True)
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def unique_id():
+    return b'\xe6\x61\x41\x04\x03\x5f\x6b\x2a'
+
+
+def reset():
+    raise SystemExit("machine.reset()")
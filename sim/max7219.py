@@ -0,0 +1,123 @@
+from sim import framebuf
+
+# Stand-in for mcauser's max7219.py driver, plus a model of the LED modules
+# behind it (Max7219Chain) decoding what the driver sends over SPI.
+
+_NOOP = 0
+_DIGIT0 = 1
+_DECODEMODE = 9
+_INTENSITY = 10
+_SCANLIMIT = 11
+_SHUTDOWN = 12
+_DISPLAYTEST = 15
+
+
+class Matrix8x8:
+
+    def __init__(self, spi, cs, num):
+        self.spi = spi
+        self.cs = cs
+        self.cs.init(cs.OUT, True)
+        self.buffer = bytearray(8 * num)
+        self.num = num
+        fb = framebuf.FrameBuffer(self.buffer, 8 * num, 8, framebuf.MONO_HLSB)
+        self.framebuf = fb
+        self.fill = fb.fill
+        self.pixel = fb.pixel
+        self.hline = fb.hline
+        self.vline = fb.vline
+        self.line = fb.line
+        self.rect = fb.rect
+        self.fill_rect = fb.fill_rect
+        self.text = fb.text
+        self.scroll = fb.scroll
+        self.blit = fb.blit
+
+        self.sim_chain = Max7219Chain(spi, cs, num)
+        self.init()
+
+    def _write(self, command, data):
+        self.cs(0)
+        for m in range(self.num):
+            self.spi.write(bytearray([command, data]))
+        self.cs(1)
+
+    def init(self):
+        for command, data in (
+            (_SHUTDOWN, 0),
+            (_DISPLAYTEST, 0),
+            (_SCANLIMIT, 7),
+            (_DECODEMODE, 0),
+            (_SHUTDOWN, 1),
+        ):
+            self._write(command, data)
+
+    def brightness(self, value):
+        if not 0 <= value <= 15:
+            raise ValueError("Brightness out of range")
+        self._write(_INTENSITY, value)
+
+    def show(self):
+        for y in range(8):
+            self.cs(0)
+            for m in range(self.num):
+                self.spi.write(bytearray([_DIGIT0 + y, self.buffer[(y * self.num) + m]]))
+            self.cs(1)
+
+
+class Max7219Chain:
+
+    # The daisy-chained modules. The packet sent first in a transaction ends up
+    # in module 0, which shows the leftmost columns of the driver's framebuffer.
+
+    def __init__(self, spi, cs, num):
+        self.num = num
+        self.cols = num  # modules per row, the chain runs left to right, the top row first
+        self.rows = bytearray(8 * num)  # digit registers, row y of module m at [y * num + m]
+        self.intensity = [0] * num
+        self.shutdown = [True] * num
+        self.transactions = 0
+        self.packets = 0
+        self.noops = 0
+        self._data = None
+        spi.devices.append(self)
+        cs.listeners.append(self._cs_changed)
+
+    def _cs_changed(self, cs):
+        if cs.value() == 0:
+            self._data = bytearray()
+        elif self._data is not None:
+            self._latch(self._data)
+            self._data = None
+
+    def receive(self, buf):
+        if self._data is not None:
+            self._data.extend(buf)
+
+    def _latch(self, data):
+        self.transactions += 1
+        # bytes beyond the chain length have been shifted out of module 0,
+        # a short transaction only reaches the modules closest to the controller
+        data = data[-2 * self.num:]
+        offset = self.num - len(data) // 2
+        for n in range(len(data) // 2):
+            m = offset + n
+            register = data[2 * n]
+            value = data[2 * n + 1]
+            self.packets += 1
+            if register == _NOOP:
+                self.noops += 1
+            elif _DIGIT0 <= register < _DIGIT0 + 8:
+                self.rows[(register - _DIGIT0) * self.num + m] = value
+            elif register == _INTENSITY:
+                self.intensity[m] = value
+            elif register == _SHUTDOWN:
+                self.shutdown[m] = value == 0
+
+    def pixel(self, x, y):
+        m = y // 8 * self.cols + x // 8
+        return 1 if self.rows[y % 8 * self.num + m] & (0x80 >> (x & 7)) else 0
+
+    def ascii(self, on='#', off='.'):
+        return "\n".join("".join(on if self.pixel(x, y) else off for x in range(8 * self.cols))
+                         for y in range(8 * self.num // self.cols))
@@ -0,0 +1,40 @@
+def const(expr):
+    return expr
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def schedule(func, arg):
+    # MicroPython runs func soon after the IRQ returns, the simulator right away
+    func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def mem_info(verbose=False):
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        used, peak = tracemalloc.get_traced_memory()
+        print("heap used: " + str(used) + ", peak: " + str(peak))
+    else:
+        print("heap: start tracemalloc to trace allocations")
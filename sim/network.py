@@ -0,0 +1,131 @@
+from sim import clock as _clock
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class _Radio:
+
+    # State of the CYW43 radio, shared by all WLAN objects of an interface
+
+    def __init__(self):
+        self.active = False
+        self.active_since_us = 0
+        self.on_us = 0  # total virtual time the radio was active
+        self.status = STAT_IDLE
+        self.connected_at_us = None
+        self.ssid = None
+        self.ifconfig = ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
+        self.static_ifconfig = None
+        self.connects = 0
+        self.config = {'pm': 0xa11142, 'channel': 6, 'mac': b'\x28\xcd\xc1\x00\x00\x01', 'hostname': 'PicoW'}
+        self.bssid = b'\x3c\xa6\x2f\x00\x00\x01'  # like rp2, config() doesn't know it
+
+
+class WLAN:
+
+    PM_NONE = 0x10
+    PM_PERFORMANCE = 0xa11142
+    PM_POWERSAVE = 0x111022
+
+    # Simulated access point
+    ssid = None  # None accepts any SSID
+    password = None  # None accepts any password
+    connect_time_s = 2.5  # association and DHCP
+    reconnect_time_s = 0.8  # association with known BSSID/channel and static address
+    reachable = True
+
+    _radios = {}
+
+    def __init__(self, interface_id=STA_IF):
+        if interface_id not in WLAN._radios:
+            WLAN._radios[interface_id] = _Radio()
+        self._radio = WLAN._radios[interface_id]
+
+    def active(self, is_active=None):
+        radio = self._radio
+        if is_active is None:
+            return radio.active
+        if is_active and not radio.active:
+            radio.active_since_us = _clock.current.us
+        elif not is_active and radio.active:
+            radio.on_us += _clock.current.us - radio.active_since_us
+            radio.status = STAT_IDLE
+            radio.connected_at_us = None
+            radio.static_ifconfig = None  # DHCP again after a reset of the interface
+        radio.active = bool(is_active)
+
+    def radio_on_us(self):
+        # simulator only: total time the radio has been active
+        radio = self._radio
+        if radio.active:
+            return radio.on_us + _clock.current.us - radio.active_since_us
+        return radio.on_us
+
+    def connect(self, ssid=None, key=None, bssid=None, channel=None):
+        radio = self._radio
+        if not radio.active:
+            raise OSError("WLAN not active")
+        radio.connects += 1
+        radio.ssid = ssid
+        if not WLAN.reachable or (WLAN.ssid is not None and ssid != WLAN.ssid):
+            radio.status = STAT_NO_AP_FOUND
+            radio.connected_at_us = None
+        elif WLAN.password is not None and key != WLAN.password:
+            radio.status = STAT_WRONG_PASSWORD
+            radio.connected_at_us = None
+        else:
+            radio.status = STAT_CONNECTING
+            if (bssid is not None or channel is not None) and radio.static_ifconfig is not None:
+                delay = WLAN.reconnect_time_s
+            else:
+                delay = WLAN.connect_time_s
+            radio.connected_at_us = _clock.current.us + int(delay * 1000000)
+
+    def disconnect(self):
+        self._radio.status = STAT_IDLE
+        self._radio.connected_at_us = None
+
+    def _update(self):
+        radio = self._radio
+        if radio.status == STAT_CONNECTING and radio.connected_at_us is not None \
+                and _clock.current.us >= radio.connected_at_us:
+            radio.status = STAT_GOT_IP
+            radio.ifconfig = radio.static_ifconfig or ('192.168.188.34', '255.255.255.0',
+                                                       '192.168.188.1', '192.168.188.1')
+
+    def isconnected(self):
+        self._update()
+        return self._radio.active and self._radio.status == STAT_GOT_IP
+
+    def status(self, param=None):
+        self._update()
+        if param == 'rssi':
+            return -62
+        return self._radio.status
+
+    def ifconfig(self, config=None):
+        if config is None:
+            self._update()
+            return self._radio.ifconfig
+        self._radio.static_ifconfig = tuple(config)
+        self._radio.ifconfig = tuple(config)
+
+    def config(self, *args, **kwargs):
+        if args:
+            if args[0] not in self._radio.config:
+                raise ValueError("unknown config param")
+            return self._radio.config[args[0]]
+        self._radio.config.update(kwargs)
+
+    def scan(self):
+        # (ssid, bssid, channel, RSSI, security, hidden)
+        return [((WLAN.ssid or 'MyWiFiSSID').encode(), self._radio.bssid,
+                 self._radio.config['channel'], -62, 3, False)]
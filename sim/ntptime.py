@@ -0,0 +1,20 @@
+import datetime
+
+from sim import clock as _clock
+from sim.machine import RTC
+
+host = 'pool.ntp.org'
+timeout = 1
+
+
+def time():
+    # seconds since 2000-01-01 UTC, MicroPython's epoch
+    _clock.current.busy(0.05)
+    return int((_clock.current.now() - datetime.datetime(2000, 1, 1)).total_seconds())
+
+
+def settime():
+    # sets the RTC to UTC
+    _clock.current.busy(0.05)
+    now = _clock.current.now()
+    RTC().datetime((now.year, now.month, now.day, now.weekday(), now.hour, now.minute, now.second, 0))
@@ -0,0 +1,79 @@
+import http.client
+import io
+import json as _json
+
+from sim import clock as _clock
+from sim import network
+from sim.usocket import hosts
+
+# Stand-in for urequests, doing real HTTP on the host. Host names are
+# redirected like in usocket.
+latency_s = 0.08  # virtual time a request takes
+
+
+class Response:
+
+    def __init__(self, status_code, reason, body):
+        self.status_code = status_code
+        self.reason = reason
+        self.encoding = 'utf-8'
+        self.raw = io.BytesIO(body)  # the socket stream in urequests
+        self._cached = None
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+            self.raw = None
+        self._cached = None
+
+    @property
+    def content(self):
+        if self._cached is None:
+            try:
+                self._cached = self.raw.read()
+            finally:
+                self.raw.close()
+                self.raw = None
+        return self._cached
+
+    @property
+    def text(self):
+        return str(self.content, self.encoding)
+
+    def json(self):
+        return _json.loads(self.content)
+
+
+def request(method, url, data=None, json=None, headers={}, timeout=None):
+    if not network.WLAN(network.STA_IF).isconnected():
+        raise OSError(-2)  # getaddrinfo fails without network
+
+    proto, dummy, host, path = url.split('/', 3)
+    if ':' in host:
+        host, port = host.split(':', 1)
+        port = int(port)
+    else:
+        port = 80
+    address, port = hosts.get(host, (host, port))
+
+    if json is not None:
+        data = _json.dumps(json)
+
+    _clock.current.busy(latency_s)
+    connection = http.client.HTTPConnection(address, port, timeout=timeout or 10)
+    try:
+        connection.request(method, '/' + path, body=data, headers=headers)
+        response = connection.getresponse()
+        return Response(response.status, response.reason, response.read())
+    except (http.client.HTTPException, ConnectionError) as e:
+        raise OSError(str(e))
+    finally:
+        connection.close()
+
+
+def get(url, **kw):
+    return request('GET', url, **kw)
+
+
+def post(url, **kw):
+    return request('POST', url, **kw)
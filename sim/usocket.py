@@ -0,0 +1,79 @@
+import errno
+import socket as _socket
+
+from sim import clock as _clock
+from sim import network
+
+# Stand-in for MicroPython's usocket (TCP only), on real host sockets.
+# hosts redirects a host name to (address, port), e.g. to the fake worldtimeapi server.
+#
+# The host answers within microseconds of wall time, so the sockets block
+# underneath. Non-blocking sockets still behave like lwIP ones in virtual time:
+# connect() raises EINPROGRESS, send() raises EAGAIN until the connection is
+# up after rtt_s, and readinto() returns None until the answer arrived rtt_s
+# after the request.
+
+hosts = {}
+dns_s = 0.02  # virtual time getaddrinfo blocks
+rtt_s = 0.04  # virtual round trip time
+
+AF_INET = _socket.AF_INET
+SOCK_STREAM = _socket.SOCK_STREAM
+
+
+def getaddrinfo(host, port, af=0, type=0, proto=0, flags=0):
+    if not network.WLAN(network.STA_IF).isconnected():
+        raise OSError(-2)  # no DNS server without network
+    _clock.current.busy(dns_s)
+    address, port = hosts.get(host, (host, port))
+    return [(AF_INET, SOCK_STREAM, 0, '', (address, port))]
+
+
+class socket:
+
+    def __init__(self, af=AF_INET, type=SOCK_STREAM, proto=0):
+        self._sock = _socket.socket(af, type, proto)
+        self._sock.settimeout(10)
+        self._blocking = True
+        self._ready_us = 0  # virtual time the connection is up or the answer arrives
+
+    def setblocking(self, flag):
+        self._blocking = flag
+
+    def _wait(self, code):
+        # virtual time until the peer is ready, lwIP's error while it is not
+        wait_us = self._ready_us - _clock.current.us
+        if wait_us > 0:
+            if not self._blocking:
+                raise OSError(code)
+            _clock.current.busy(wait_us / 1000000)
+
+    def connect(self, address):
+        try:
+            self._sock.connect(address)
+        except (_socket.timeout, ConnectionError) as e:
+            raise OSError(errno.ECONNREFUSED) from e
+        self._ready_us = _clock.current.us + int(rtt_s * 1000000)
+        if not self._blocking:
+            raise OSError(errno.EINPROGRESS)
+
+    def send(self, data):
+        self._wait(errno.EAGAIN)
+        self._sock.sendall(data)
+        self._ready_us = _clock.current.us + int(rtt_s * 1000000)
+        return len(data)
+
+    write = send
+
+    def readinto(self, buf):
+        try:
+            self._wait(errno.EAGAIN)
+        except OSError:
+            return None
+        try:
+            return self._sock.recv_into(buf)
+        except (_socket.timeout, ConnectionError) as e:
+            raise OSError(errno.ECONNRESET) from e
+
+    def close(self):
+        self._sock.close()
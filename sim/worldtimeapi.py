@@ -0,0 +1,106 @@
+import datetime
+import http.server
+import json
+import threading
+
+from sim import usocket
+
+
+class WorldTimeAPI:
+
+    # A local fake of worldtimeapi.org, answering /api/ip and /api/timezone/<zone>
+    # with the simulator's reference time. fail_count makes the next requests
+    # answer with HTTP 503, like the real service does when overloaded.
+    #
+    # utc_offset_minutes is the standard time offset. With dst, daylight saving
+    # time adds an hour from the last Sunday in March to the last Sunday in
+    # October at 01:00 UTC, as in the EU (the sim starts on 2022-10-07, summer
+    # time ends on 2022-10-30).
+
+    def __init__(self, clock, utc_offset_minutes=60, timezone='Europe/Berlin', dst=True):
+        self.clock = clock
+        self.utc_offset_minutes = utc_offset_minutes
+        self.timezone = timezone
+        self.dst = dst
+        self.fail_count = 0
+        self.requests = 0
+        self.failures = 0
+        self._server = None
+
+    def dst_changes(self, year):
+        # UTC start and end of daylight saving time in year
+        changes = []
+        for month in (3, 10):
+            last = datetime.datetime(year, month, 31, 1, 0)
+            changes.append(last - datetime.timedelta(days=(last.weekday() + 1) % 7))
+        return changes
+
+    def payload(self):
+        utc = self.clock.now()
+        dst_from = dst_until = None
+        if self.dst:
+            start, end = self.dst_changes(utc.year)
+            if start <= utc < end:
+                dst_from, dst_until = start, end
+        dst_offset = 3600 if dst_from else 0
+        offset_minutes = self.utc_offset_minutes + dst_offset // 60
+        local = utc + datetime.timedelta(minutes=offset_minutes)
+        sign = '+' if offset_minutes >= 0 else '-'
+        offset = abs(offset_minutes)
+        utc_offset = sign + '%02d:%02d' % (offset // 60, offset % 60)
+        return {
+            'abbreviation': 'CEST' if dst_from else 'CET',
+            'client_ip': '127.0.0.1',
+            'datetime': local.strftime('%Y-%m-%dT%H:%M:%S.%f') + utc_offset,
+            'day_of_week': (local.weekday() + 1) % 7,  # Sunday=0
+            'day_of_year': local.timetuple().tm_yday,
+            'dst': dst_from is not None,
+            'dst_from': dst_from and dst_from.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+            'dst_offset': dst_offset,
+            'dst_until': dst_until and dst_until.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+            'raw_offset': self.utc_offset_minutes * 60,
+            'timezone': self.timezone,
+            'unixtime': int((utc - datetime.datetime(1970, 1, 1)).total_seconds()),
+            'utc_datetime': utc.strftime('%Y-%m-%dT%H:%M:%S.%f') + '+00:00',
+            'utc_offset': utc_offset,
+            'week_number': local.isocalendar()[1],
+        }
+
+    def start(self):
+        api = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                api.requests += 1
+                if api.fail_count > 0:
+                    api.fail_count -= 1
+                    api.failures += 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.path == '/api/ip' or self.path.startswith('/api/timezone/'):
+                    body = json.dumps(api.payload()).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        usocket.hosts['worldtimeapi.org'] = self._server.server_address
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            usocket.hosts.pop('worldtimeapi.org', None)
+            self._server = None
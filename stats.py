@@ -0,0 +1,104 @@
+from array import array
+
+# Counters and histograms for the hot paths of the display and the main loop.
+#
+# Every update is guarded with "if __debug__:", so the instrumentation is
+# compiled out completely when the files are built with "mpy-cross -O1" or
+# imported after micropython.opt_level(1).
+#
+# Send "s" over the serial connection to print the statistics, "r" to reset them.
+
+_all = []
+
+
+class Counter:
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        _all.append(self)
+
+    def add(self, n=1):
+        self.value += n
+
+    def reset(self):
+        self.value = 0
+
+    def dump(self):
+        print(self.name + ": " + str(self.value))
+
+
+class Histogram:
+
+    # Bucket n counts the values from 2**(n-1) up to 2**n - 1, bucket 0 the zeros
+
+    def __init__(self, name, unit, buckets=24):
+        self.name = name
+        self.unit = unit
+        self.buckets = array('L', [0] * buckets)
+        self.reset()
+        _all.append(self)
+
+    def add(self, value):
+        if value < 0:
+            value = 0
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        bucket = 0
+        while value and bucket < len(self.buckets) - 1:
+            value >>= 1
+            bucket += 1
+        self.buckets[bucket] += 1
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.min = 0x3fffffff
+        self.max = 0
+        for bucket in range(0, len(self.buckets)):
+            self.buckets[bucket] = 0
+
+    def dump(self):
+        if self.count == 0:
+            print(self.name + ": -")
+            return
+        print(self.name + ": n=" + str(self.count) + ", min=" + str(self.min) +
+              ", mean=" + str(self.total // self.count) + ", max=" + str(self.max) + " " + self.unit)
+        for bucket in range(0, len(self.buckets)):
+            if self.buckets[bucket]:
+                print("  <" + str(1 << bucket) + " " + self.unit + ": " + str(self.buckets[bucket]))
+
+
+frames = Counter("frames rendered")
+pixels = Counter("pixels written")
+buffer_bytes = Counter("buffer bytes written")
+spi_transactions = Counter("SPI transactions")
+spi_bytes = Counter("SPI bytes")
+draw_pos_us = Histogram("draw_pos", "us")
+move_ms = Histogram("wheels_move_to", "ms")
+boot_ms = Histogram("boot to first frame", "ms")
+minute_late_ms = Histogram("minute tick lateness", "ms")
+input_latency_us = Histogram("button event to handler", "us")
+sync_ms = Histogram("time sync", "ms")
+wlan_connect_ms = Histogram("WLAN connect", "ms")
+wlan_radio_on_ms = Histogram("WLAN radio on", "ms")
+
+
+def register(item):
+    # adds an object with dump() and reset() methods to the statistics
+    _all.append(item)
+
+
+def dump():
+    print("---- stats ----")
+    for item in _all:
+        item.dump()
+
+
+def reset():
+    for item in _all:
+        item.reset()
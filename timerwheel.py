@@ -0,0 +1,182 @@
+from micropython import const
+import time
+
+from runtime import ThreadSafeFlag, TimeoutError, wait_for_ms
+
+_STOPPED = const(-1)
+_NONE = const(-1)  # end of a slot's list
+
+# deadlines further ahead than half the ticks period can't be told from past ones
+_MAX_DELAY_MS = (time.ticks_add(0, -1) + 1) // 2 - 1
+
+
+class TimerWheel:
+
+    # Hashed timer wheel owning the deadlines of the clock: minute tick, snooze,
+    # alarm auto-stop, time sync retry and sensor cadence.
+    #
+    # Deadlines are ticks_ms values and only compared with ticks_diff, so they
+    # keep working when ticks_ms wraps (about every 12 days on the RP2040). A
+    # deadline may lie up to half the ticks period (about 6 days) ahead.
+    #
+    # The wheel turns in slots of resolution_ms. Each slot is a doubly linked
+    # list of timers, kept in per-timer arrays of the next and previous id, so
+    # start() links a timer into the slot its deadline falls into and stop()
+    # unlinks it without searching or allocating. expire() only visits the slots
+    # time has passed since its last call. None of them depends on the number of
+    # timers. A timer more than one turn ahead stays in its slot until the turn
+    # it is due.
+    #
+    # run() is the task driving the wheel. It sleeps until the next deadline and
+    # calls the callbacks of the expired timers, so callbacks must be short,
+    # e.g. setting a flag. A timer without callback is a deadline to poll with
+    # active() and remaining_ms().
+
+    def __init__(self, slots=64, resolution_ms=1000):
+        self._heads = [_NONE] * slots  # first timer of each slot
+        self._resolution_ms = resolution_ms
+        self._cursor_ms = time.ticks_ms()  # start of the slot expire() visits next
+        self._index = 0  # slot of _cursor_ms
+        self._count = 0  # running timers
+
+        # per timer, indexed by the id add() returns
+        self._deadlines = []
+        self._slot_of = []  # _STOPPED when not running
+        self._next = []  # next timer in the same slot
+        self._prev = []
+        self._periods = []
+        self._callbacks = []
+
+        self._flag = ThreadSafeFlag()  # wakes run() for a deadline before its wake-up
+        self._wake_ticks_ms = None  # when run() wakes up next, None while it waits for the flag only
+
+    def add(self, callback=None, period_ms=0):
+        # New stopped timer, returns its id. With period_ms it restarts itself
+        # each time it expires, counting from the deadline, so it doesn't drift.
+        self._deadlines.append(0)
+        self._slot_of.append(_STOPPED)
+        self._next.append(_NONE)
+        self._prev.append(_NONE)
+        self._periods.append(period_ms)
+        self._callbacks.append(callback)
+        return len(self._callbacks) - 1
+
+    def start(self, id, delay_ms):
+        # (Re)starts timer id to expire in delay_ms
+        self.start_at(id, time.ticks_add(time.ticks_ms(), delay_ms))
+
+    def start_at(self, id, deadline):
+        offset = time.ticks_diff(deadline, self._cursor_ms)
+        if time.ticks_diff(deadline, time.ticks_ms()) > _MAX_DELAY_MS:
+            raise ValueError("deadline too far ahead")
+        self.stop(id)
+        index = self._index
+        if offset > 0:
+            index = (index + offset // self._resolution_ms) % len(self._heads)
+        head = self._heads[index]
+        self._next[id] = head
+        self._prev[id] = _NONE
+        if head != _NONE:
+            self._prev[head] = id
+        self._heads[index] = id
+        self._slot_of[id] = index
+        self._deadlines[id] = deadline
+        self._count += 1
+
+        if self._wake_ticks_ms is None or time.ticks_diff(deadline, self._wake_ticks_ms) < 0:
+            self._flag.set()
+
+    def stop(self, id):
+        index = self._slot_of[id]
+        if index != _STOPPED:
+            prev = self._prev[id]
+            next = self._next[id]
+            if prev == _NONE:
+                self._heads[index] = next
+            else:
+                self._next[prev] = next
+            if next != _NONE:
+                self._prev[next] = prev
+            self._slot_of[id] = _STOPPED
+            self._count -= 1
+
+    def active(self, id):
+        # True while timer id runs
+        return self._slot_of[id] != _STOPPED
+
+    def remaining_ms(self, id):
+        # ms until timer id expires, None if it's stopped
+        if self._slot_of[id] == _STOPPED:
+            return None
+        return max(time.ticks_diff(self._deadlines[id], time.ticks_ms()), 0)
+
+    def expire(self, now=None):
+        # Calls the callbacks of the timers due at ticks_ms now, returns their number
+        if now is None:
+            now = time.ticks_ms()
+        slots = len(self._heads)
+        steps = time.ticks_diff(now, self._cursor_ms) // self._resolution_ms
+        fired = 0
+        # after a long pause (e.g. the blocking self test) one turn visits every slot
+        for step in range(0, min(steps, slots - 1) + 1):
+            fired += self._expire_slot((self._index + step) % slots, now)
+        if steps > 0:
+            self._cursor_ms = time.ticks_add(self._cursor_ms, steps * self._resolution_ms)
+            self._index = (self._index + steps) % slots
+        return fired
+
+    def _expire_slot(self, index, now):
+        fired = 0
+        id = self._heads[index]
+        while id != _NONE:
+            deadline = self._deadlines[id]
+            if time.ticks_diff(deadline, now) > 0:
+                id = self._next[id]  # later in this slot or a later turn
+                continue
+            self.stop(id)
+            period_ms = self._periods[id]
+            if period_ms:
+                deadline = time.ticks_add(deadline, period_ms)
+                if time.ticks_diff(deadline, now) <= 0:  # missed periods are skipped
+                    deadline = time.ticks_add(now, period_ms)
+                self.start_at(id, deadline)
+            if self._callbacks[id] is not None:
+                self._callbacks[id]()
+            fired += 1
+            # the callback may have started or stopped timers of this slot, the
+            # fired ones are gone or due later, so starting over ends
+            id = self._heads[index]
+        return fired
+
+    def next_ms(self, now=None):
+        # ms until run() has to call expire() again, None without running timers
+        if self._count == 0:
+            return None
+        if now is None:
+            now = time.ticks_ms()
+        slots = len(self._heads)
+        for step in range(0, slots):
+            id = self._heads[(self._index + step) % slots]
+            if id != _NONE:
+                # the end of the slot at the latest, timers a turn ahead wait there
+                wait_ms = time.ticks_diff(self._cursor_ms, now) + (step + 1) * self._resolution_ms
+                while id != _NONE:
+                    wait_ms = min(wait_ms, time.ticks_diff(self._deadlines[id], now))
+                    id = self._next[id]
+                return max(wait_ms, 0)
+
+    async def run(self):
+        while True:
+            now = time.ticks_ms()
+            self.expire(now)
+            wait_ms = self.next_ms(now)
+            self._flag.clear()
+            if wait_ms is None:
+                self._wake_ticks_ms = None
+                await self._flag.wait()
+            elif wait_ms > 0:
+                self._wake_ticks_ms = time.ticks_add(now, wait_ms)
+                try:
+                    await wait_for_ms(self._flag.wait(), wait_ms)
+                except TimeoutError:
+                    pass
@@ -1,103 +1,316 @@
-import urequests
-import json
+from micropython import const
+import random
 import time
 import ntptime
 
+from alarmhandler import civil_from_days, days_from_civil
 from config import Settings
+from drift import DriftModel
+from httpget import HttpGet
+import stats
+from wlan import WlanHandler
+
+# TimeSync states
+_IDLE = const(0)
+_CONNECTING = const(1)
+_REQUEST = const(2)
+_BACKOFF = const(3)
+
+# worldtimeapi fields used, see json_fields()
+_WORLDTIMEAPI_FIELDS = (b'datetime', b'day_of_week', b'dst_until', b'utc_offset')
+
+
+class JsonFields:
+
+    # Picks the values of keys out of a flat JSON object fed in pieces with feed(),
+    # as strings (without quotes), None for missing and null values. Neither the
+    # body nor a dict of it is ever held in memory.
+
+    def __init__(self, keys):
+        self._keys = keys
+        self.values = [None] * len(keys)
+        self._token = bytearray(40)  # longer strings are cut off
+        self._n = 0
+        self._in_string = False
+        self._bare = False  # in a number, true, false or null
+        self._is_key = True
+        self._key = -1  # index of the key whose value comes next
+
+    def feed(self, buf, count):
+        # parses the first count bytes of buf
+        keys = self._keys
+        values = self.values
+        token = self._token
+        n = self._n
+        in_string = self._in_string
+        bare = self._bare
+        is_key = self._is_key
+        key = self._key
+        for i in range(0, count):
+            c = buf[i]
+            if in_string:
+                if c == 0x22:  # "
+                    in_string = False
+                    if is_key:
+                        key = -1
+                        for k in range(0, len(keys)):
+                            if n == len(keys[k]) and token[:n] == keys[k]:
+                                key = k
+                    elif key >= 0:
+                        values[key] = str(token[:n], 'utf-8')
+                elif n < len(token):
+                    token[n] = c
+                    n += 1
+            elif bare:
+                if c == 0x2c or c == 0x7d:  # , }
+                    bare = False
+                    is_key = True
+                    if key >= 0 and token[:n] != b'null':
+                        values[key] = str(token[:n], 'utf-8')
+                elif n < len(token) and c > 0x20:
+                    token[n] = c
+                    n += 1
+            elif c == 0x22:
+                in_string = True
+                n = 0
+            elif c == 0x3a:  # :
+                is_key = False
+            elif c == 0x2c:
+                is_key = True
+            elif not is_key and c > 0x20:
+                bare = True
+                token[0] = c
+                n = 1
+        self._n = n
+        self._in_string = in_string
+        self._bare = bare
+        self._is_key = is_key
+        self._key = key
+
+
+def json_fields(stream, keys, size=64):
+    # Reads a flat JSON object from stream through a buffer of size bytes, see JsonFields
+    fields = JsonFields(keys)
+    buf = bytearray(size)
+    while True:
+        count = stream.readinto(buf)
+        if not count:
+            break
+        fields.feed(buf, count)
+    return fields.values
+
+
+def rtcdt_seconds(rtcdt):
+    return days_from_civil(rtcdt[0], rtcdt[1], rtcdt[2]) * 86400 + rtcdt[4] * 3600 + rtcdt[5] * 60 + rtcdt[6]
+
+
+def utc_offset_seconds(text):
+    # e.g. +02:00 -> 7200
+    seconds = int(text[1:3]) * 3600 + int(text[4:6]) * 60
+    return -seconds if text[0] == '-' else seconds
+
+
+def seconds_rtcdt(seconds):
+    days = seconds // 86400
+    year, month, day = civil_from_days(days)
+    seconds = seconds % 86400
+    return (year, month, day, (days + 3) % 7, seconds // 3600, seconds // 60 % 60, seconds % 60, 0)
+
 
 class TimeSync:
     
-    def __init__(self, rtc):
+    def __init__(self, rtc, timers):
 
         self._synced = False
         self._synced_last_rtcdt = None
 
         self._rtc = rtc
+        self._wlan = WlanHandler()
 
         service = 'http://worldtimeapi.org/api/'
         if Settings.timezone == 'auto':
             self._url = service + 'ip'
         else:
             self._url = service + 'timezone/' + Settings.timezone
-        self._time_sync_running = False
 
-    def time_sync(self):
+        try:
+            self._timeserver_type = Settings.timeserver_type
+        except AttributeError:
+            self._timeserver_type = 'worldtimeapi'
 
-        if not self._time_sync_running:
-            self._time_sync_running = True
+        self.attempts = 8  # requests per sync before giving up
+        self.backoff_ms = 1000  # wait after the first failed request, doubled after each failure
+        self.backoff_max_ms = 64000
+        self.connect_timeout_ms = 15000
+        self.request_timeout_ms = 5000
+        self.retry_ms = 600000  # wait after a failed sync before the next one
 
-            try:
-                timeserver_type = Settings.timeserver_type
-            except AttributeError:
-                timeserver_type = 'worldtimeapi'
-            
-            if timeserver_type == 'worldtimeapi':
-                self._worldtimeapi_time_sync()
+        self._state = _IDLE
+        self._attempt = 0
+        self._state_ticks_ms = 0  # when the current state was entered
+        self._wait_ms = 0  # backoff time
+        self._round_ticks_ms = 0
+        self._timers = timers
+        self._retry_timer = timers.add()  # no new sync while it runs
+        self._request = None  # HttpGet in progress
+        self._request_wait_ms = 0
+        self._fields = None
+        self._finished = False
+
+        # The sync interval grows while the drift correction keeps the RTC accurate
+        self._drift = DriftModel()
+        self.interval_days = 1
+        self.interval_max_days = 8
+        self._dst_change = None  # (year, month, day) of the next daylight saving time change
+        self._utc_offset_s = 0  # UTC offset of the time the RTC was last set to
+
+        # last known time, kept in flash for the next boot
+        try:
+            self._cache_path = Settings.time_cache
+        except AttributeError:
+            self._cache_path = 'timecache.txt'
+
+    def poll(self):
+        # Does one small step of the time sync and returns the ms until the next call.
+        # No step waits for the network, except the host name lookup and NTP.
+        now = time.ticks_ms()
+
+        if self._state == _IDLE:
+            if self._timers.active(self._retry_timer):
+                return min(self._timers.remaining_ms(self._retry_timer), 60000)
+            if not self.necessary:
+                return 60000
+            print("time sync started, last sync:", self._synced_last_rtcdt)
+            if self.interval_days > 1:
+                self._wlan.forget_lease()  # leases often last a day
+            self._attempt = 0
+            self._round_ticks_ms = now
+            self._connect()
+            return 500
+
+        if self._state == _CONNECTING:
+            if self._wlan.connected():
+                self._enter(_REQUEST, now)
+                return 0
+            if time.ticks_diff(now, self._state_ticks_ms) > self.connect_timeout_ms:
+                print("WLAN: no connection, status=" + str(self._wlan.status()))
+                return self._attempt_failed(now)
+            return 500
+
+        if self._state == _REQUEST:
+            if self._timeserver_type == 'worldtimeapi':
+                ok = self._worldtimeapi_time_sync()
+                if ok is None:
+                    return self._request_wait_ms  # request in progress
             else:
-                self._ntp_time_sync()
+                ok = self._ntp_time_sync()
+            if ok:
+                self._finish(True, now)
+                return 60000
+            return self._attempt_failed(now)
+
+        if self._state == _BACKOFF:
+            if time.ticks_diff(now, self._state_ticks_ms) >= self._wait_ms:
+                self._connect()
+                return 0
+            return self._wait_ms - time.ticks_diff(now, self._state_ticks_ms)
+
+    def _enter(self, state, now):
+        self._state = state
+        self._state_ticks_ms = now
+
+    def _connect(self):
+        self._wlan.open()
+        self._enter(_CONNECTING, time.ticks_ms())
+
+    def _attempt_failed(self, now):
+        # The next attempt connects from scratch, a request can fail on an
+        # association with a stale address as well
+        self._wlan.forget()
+        self._attempt += 1
+        if self._attempt >= self.attempts:
+            self._finish(False, now)
+            return self.retry_ms
+
+        # exponential backoff, plus up to 50% jitter so that clocks don't retry in lockstep
+        wait_ms = min(self.backoff_ms << (self._attempt - 1), self.backoff_max_ms)
+        self._wait_ms = wait_ms + wait_ms * random.getrandbits(8) // 512
+        print("time sync attempt " + str(self._attempt) + " failed, retry in " + str(self._wait_ms) + " ms")
+        self._enter(_BACKOFF, now)
+        return self._wait_ms
+
+    def _finish(self, synced, now):
+        self._synced = synced
+        self._state = _IDLE
+        self._finished = True
+        self._wlan.close()
+        if synced:
+            self._timers.stop(self._retry_timer)
+        else:
+            self._timers.start(self._retry_timer, self.retry_ms)
+        print("time sync " + ("done" if synced else "failed") + " after " +
+              str(time.ticks_diff(time.ticks_ms(), self._round_ticks_ms)) + " ms, WLAN connect " +
+              str(self._wlan.connect_ms) + " ms, radio on " + str(self._wlan.radio_on_ms) + " ms")
+        if __debug__:
+            stats.sync_ms.add(time.ticks_diff(time.ticks_ms(), self._round_ticks_ms))
+
+    def finished(self):
+        # True once after each completed sync, successful or not
+        ret = self._finished
+        self._finished = False
+        return ret
+
+    def get_running(self):
+        return self._state != _IDLE
+
+    running = property(get_running)
 
-        self._time_sync_running = False
-        time.sleep(1)
-            
     def _worldtimeapi_time_sync(self):
+        # One step of the request, None while it is in progress, then True if the RTC was set
+        if self._request is None:
+            print("requesting time from URL " + self._url + "...")
+            self._fields = JsonFields(_WORLDTIMEAPI_FIELDS)
+            self._request = HttpGet(self._url, self._fields.feed, self.request_timeout_ms)
+        try:
+            wait_ms = self._request.poll()
+        except OSError as e:
+            print("OSError:", e)
+            self._request = None
+            return False
+        if wait_ms is not None:
+            self._request_wait_ms = wait_ms
+            return None
 
-        self._synced = False
+        print("response.status_code=", self._request.status)
+        fields = self._fields.values if self._request.status == 200 else None
+        self._request = None
+        self._fields = None
 
-        # Reading HTTP Response
-        passes = 0
-        response_text = ""
-
-        repeat = True
-
-        while repeat:
-            response = None
-            try:
-                print("requesting time from URL " + self._url + "...")
-                response = urequests.get(self._url)
-                response_text = response.text
-                print("response.status_code=", response.status_code)
-            except ValueError as e:
-                print("ValueError:", e)
-                response_text = ""
-
-            except OSError as e:
-                print("OSError:", e)
-                response_text = ""
-
-            finally:
-                if response != None:
-                    response.close()
-                    print("response closed.")
-
-            if response_text == "":
-                time.sleep(1)
-            passes += 1
-
-            repeat = (response_text == "" and passes < 30)
-            
-        if len(response_text) > 0:
-            jsonData = response_text
-            aDict = json.loads(jsonData)
+        if fields is not None and fields[0] is not None and fields[1] is not None:
+            rtcdt = self._worldtimeapi_to_rtcdt(fields[0], int(fields[1]))
 
-            rtcdt = self._worldtimeapi_to_rtcdt(aDict)
+            dst_until = fields[2]
+            if dst_until:
+                self._dst_change = (int(dst_until[0:4]), int(dst_until[5:7]), int(dst_until[8:10]))
 
+            # the drift model works in UTC, the RTC has kept the offset of the last sync
+            utc_offset_s = utc_offset_seconds(fields[3]) if fields[3] else self._utc_offset_s
+            self._drift.sync(rtcdt_seconds(self._rtc.datetime()) - self._utc_offset_s,
+                             rtcdt_seconds(rtcdt) - utc_offset_s)
+            self._utc_offset_s = utc_offset_s
             self._rtc.datetime(rtcdt)
-            self._synced = True
             self._synced_last_rtcdt = rtcdt
+            self._update_interval()
             print("rtcdt, now, last=", rtcdt, self._rtc.datetime(),
                   self._synced_last_rtcdt)
+            return True
 
+        return False
 
-    def _worldtimeapi_to_rtcdt(self, aDict):
-        day_of_week = aDict['day_of_week']
-        dtstring = aDict['datetime']
-
+    def _worldtimeapi_to_rtcdt(self, dtstring, day_of_week):
         # Internet time: Sunday=0, Saturday=6
         # RTC time:      Monday=0, Sunday=6
-        if day_of_week == 6:
-            day_of_week = 0
-        else:
-            day_of_week -= 1
+        day_of_week = (day_of_week + 6) % 7
 
         # e.g. 2022-10-07T19:03:33.054288 + 02:00
         year = int(dtstring[0:4])
@@ -116,9 +329,40 @@ class TimeSync:
         return (year, month, day, day_of_week,
                  hours, minutes, seconds, subseconds)
 
-    def findJson(self, response_text):
-        txt = 'utc_offset'
-        return response_text[response_text.find(txt)-2:]
+    def save(self):
+        # Writes the RTC time and the next daylight saving time change to flash.
+        # littlefs replaces the file at close, a power cut keeps the old one.
+        if self._cache_path is None:
+            return
+        values = self._rtc.datetime()[0:7]
+        if self._dst_change is not None:
+            values += self._dst_change
+        try:
+            with open(self._cache_path, 'w') as f:
+                f.write(' '.join(str(value) for value in values))
+        except OSError as e:
+            print("time cache:", e)
+
+    def restore(self):
+        # Sets the RTC to the time save() wrote, unless the RTC is ahead of it (it
+        # keeps running through a soft reset). The RTC then lags by the time the
+        # clock was off until the first sync. Returns False without a saved time.
+        if self._cache_path is None:
+            return False
+        try:
+            with open(self._cache_path) as f:
+                values = tuple(int(value) for value in f.read().split())
+        except (OSError, ValueError):
+            return False
+        if len(values) < 7:
+            return False
+        rtcdt = values[0:7] + (0,)
+        if len(values) == 10:
+            self._dst_change = values[7:10]
+        if rtcdt_seconds(self._rtc.datetime()) < rtcdt_seconds(rtcdt):
+            self._rtc.datetime(rtcdt)
+        print("time cache: restored", rtcdt, ", RTC", self._rtc.datetime())
+        return True
 
     def get_synced(self):
         return self._synced
@@ -133,17 +377,59 @@ class TimeSync:
     def get_necessary(self):
         # time sync is necessary if
         # time has never been synced before
-        # the last time sync wasn't today and it is 3.01 a.m. or later
-        # this considers the time change from/to daylight saving time 
+        # the last time sync is interval_days ago or more and it is 3.01 a.m. or later
+        # daylight saving time changes today and it is 3.01 a.m. or later
         rtcdt = self._rtc.datetime()
-        return self._synced_last_rtcdt == None \
-           or (rtcdt[4] >= 3 and rtcdt[5] >= 1 and self._synced_last_rtcdt[2] != rtcdt[2])
+        if self._synced_last_rtcdt == None:
+            return True
+        if not (rtcdt[4] >= 3 and rtcdt[5] >= 1):
+            return False
+        today = days_from_civil(rtcdt[0], rtcdt[1], rtcdt[2])
+        last = self._synced_last_rtcdt
+        if today - days_from_civil(last[0], last[1], last[2]) >= self.interval_days:
+            return True
+        return self._dst_change is not None and (rtcdt[0], rtcdt[1], rtcdt[2]) >= self._dst_change \
+            and (last[0], last[1], last[2]) < self._dst_change
 
     necessary = property(get_necessary)
     
     def _ntp_time_sync(self):
-        self._synced = False
-        ntptime.settime()
-        self._synced = True
+        rtc_s = rtcdt_seconds(self._rtc.datetime())
+        try:
+            ntptime.settime()
+        except OSError as e:
+            print("OSError:", e)
+            return False
+        self._synced_last_rtcdt = self._rtc.datetime()
+        self._drift.sync(rtc_s - self._utc_offset_s, rtcdt_seconds(self._synced_last_rtcdt))
+        self._utc_offset_s = 0  # ntptime sets the RTC to UTC
+        self._update_interval()
+        return True
+
+    def _update_interval(self):
+        residual = self._drift.residual_s
+        if residual is None:
+            return
+        if abs(residual) <= 1:
+            self.interval_days = min(self.interval_days * 2, self.interval_max_days)
+        elif abs(residual) > 2:
+            self.interval_days = max(self.interval_days // 2, 1)
+        print("RTC drift: " + str(self._drift.ppm) + " ppm, residual: " + str(residual) +
+              (" s, " if self._drift.accepted else " s (not drift, not learned), ") +
+              "next sync in " + str(self.interval_days) + " days")
+
+    def correct_drift(self):
+        # Steps the RTC by whole seconds to follow the learned drift, call every minute
+        if self.running:
+            return 0
+        rtc_s = rtcdt_seconds(self._rtc.datetime())
+        step = self._drift.correction(rtc_s - self._utc_offset_s)
+        if step != 0:
+            self._rtc.datetime(seconds_rtcdt(rtc_s + step))
+            print("RTC drift correction: " + str(step) + " s")
+        return step
 
+    def get_drift_ppm(self):
+        return self._drift.ppm
 
+    drift_ppm = property(get_drift_ppm)
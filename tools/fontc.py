@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+
+# Font compiler, run on the PC:
+#   python tools/fontc.py fonts/glyphs.txt -o glyphs.py
+#
+# Reads glyph sets from a text file and writes them as a Python module of bytes
+# constants in the layout the display renderer uses directly: 9 bytes per glyph,
+# rows 0-7 from top to bottom plus an empty spacer row, leftmost column in bit 7
+# (MONO_HLSB). Frozen into the firmware, the constants stay in flash.
+#
+# Source format:
+#   # comment
+#   [digits]                 starts the glyph set DIGITS
+#   0 0x1e3333333333331e     glyph "0" in the hex format of the LED matrix editor
+#                            https://xantorohara.github.io/led-matrix-editor/
+#   A                        glyph "A" drawn in the following 8 lines,
+#   ..####..                 "#" is a lit LED, any other character a dark one
+#   ...
+# Glyph names are single characters, "space" and "hash" stand for " " and "#".
+
+HEIGHT = 9
+
+_NAMES = {'space': ' ', 'hash': '#'}
+
+
+class FontError(Exception):
+    pass
+
+
+def reverse_bits(val):
+    # Editor rows have the leftmost column in bit 0, MONO_HLSB has it in bit 7
+    ret = 0
+    for bit in range(0, 8):
+        if val & (1 << bit):
+            ret |= 0x80 >> bit
+    return ret
+
+
+def rows_from_hex(text):
+    # LED matrix editor: one 64 bit value, byte n is row n, bit 0 the leftmost column
+    if text[:2].lower() == '0x':
+        text = text[2:]
+    if len(text) != 16:
+        raise ValueError("expected 16 hex digits")
+    val = int(text, 16)
+    return [reverse_bits(val >> 8 * row & 0xFF) for row in range(0, 8)]
+
+
+def rows_from_art(lines):
+    rows = []
+    for line in lines:
+        if len(line) > 8:
+            raise ValueError("more than 8 columns")
+        val = 0
+        for col, c in enumerate(line):
+            if c == '#':
+                val |= 0x80 >> col
+        rows.append(val)
+    return rows
+
+
+def parse(text, filename='<font>'):
+    # Returns [(set name, [(char, rows)])] in source order
+    sets = []
+    glyphs = None
+    lines = text.splitlines()
+    n = 0
+    while n < len(lines):
+        line = lines[n].strip()
+        n += 1
+        if not line or line.startswith('#'):
+            continue
+        where = filename + ':' + str(n) + ': '
+        if line.startswith('['):
+            if not line.endswith(']') or not line[1:-1].isidentifier():
+                raise FontError(where + "bad set name " + line)
+            glyphs = []
+            sets.append((line[1:-1], glyphs))
+            continue
+        if glyphs is None:
+            raise FontError(where + "glyph outside of a [set]")
+
+        fields = line.split()
+        name = _NAMES.get(fields[0], fields[0])
+        if len(name) != 1:
+            raise FontError(where + "glyph name must be one character: " + fields[0])
+        if name in [char for char, rows in glyphs]:
+            raise FontError(where + "glyph " + repr(name) + " defined twice")
+        try:
+            if len(fields) == 2:
+                rows = rows_from_hex(fields[1])
+            elif len(fields) == 1:
+                if n + 8 > len(lines):
+                    raise ValueError("expected 8 lines")
+                rows = rows_from_art([art.strip() for art in lines[n:n + 8]])
+                n += 8
+            else:
+                raise ValueError("expected a name and a hex value")
+        except ValueError as e:
+            raise FontError(where + str(e))
+        glyphs.append((name, rows))
+    return sets
+
+
+def compile_set(glyphs):
+    data = bytearray()
+    for char, rows in glyphs:
+        data.extend(rows)
+        data.extend(bytes(HEIGHT - len(rows)))
+    return bytes(data)
+
+
+def _bytes_literal(data, indent):
+    # one glyph per line
+    lines = []
+    for start in range(0, len(data), HEIGHT):
+        lines.append(indent + "b'" + ''.join('\\x%02x' % b for b in data[start:start + HEIGHT]) + "'")
+    return '(\n' + '\n'.join(lines) + ')'
+
+
+def generate(sets, source):
+    out = ["# Generated by tools/fontc.py from " + source + ", do not edit.",
+           "#",
+           "# " + str(HEIGHT) + " bytes per glyph: rows 0-7 from top to bottom and an empty spacer row,",
+           "# the leftmost column is bit 7. <SET>_CHARS names the glyphs in order."]
+    for name, glyphs in sets:
+        const = name.upper()
+        out.append("")
+        out.append(const + "_CHARS = " + repr(''.join(char for char, rows in glyphs)))
+        out.append(const + " = " + _bytes_literal(compile_set(glyphs), ' ' * (len(const) + 4)))
+    return '\n'.join(out) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='fontc', description='Compile glyph sets into a Python module.')
+    parser.add_argument('source', help='glyph source file, e.g. fonts/glyphs.txt')
+    parser.add_argument('-o', '--output', default='glyphs.py', help='module to write (default: glyphs.py)')
+    args = parser.parse_args(argv)
+
+    with open(args.source) as f:
+        try:
+            sets = parse(f.read(), args.source)
+        except FontError as e:
+            sys.exit("fontc: " + str(e))
+
+    with open(args.output, 'w') as f:
+        f.write(generate(sets, args.source.replace(os.sep, '/')))
+    for name, glyphs in sets:
+        print(name + ": " + str(len(glyphs)) + " glyphs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import contextlib
+import io
+import os
+import struct
+import sys
+import zlib
+
+# Frame recordings, run on the PC:
+#   python tools/frames.py record before.mcf
+#   python tools/frames.py check before.mcf
+#   python tools/frames.py check
+#   python tools/frames.py gif before.mcf moves.gif
+#   python tools/frames.py png before.mcf moves.png --every 10
+#
+# record plays a sequence of wheel moves in the simulator on a recorder.FrameRecorder
+# and saves every frame the display shows. check plays the same moves and compares
+# the frames with a saved recording, so a rendering change can be checked against
+# the frames recorded before it. Both use the settings of config.py, the moves can
+# be changed with --time. Without a file, check compares with tools/golden.mcf,
+# the default moves with the config.py of the repository (record it again after
+# an intended rendering change).
+#
+# gif writes an animated GIF of a recording, png a strip of frames below each other.
+# Both are encoded here, nothing beyond the Python standard library is needed.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN = os.path.join(ROOT, 'tools', 'golden.mcf')
+
+# (mode, values) of the default moves
+_MOVES = (('clock', {'H': 12, 'M': 34, 'S': 56}),
+          ('clock', {'H': 12, 'M': 35, 'S': 0}),
+          ('clock', {'H': 13, 'M': 0, 'S': 0}),
+          ('clock', {'H': 9, 'M': 59, 'S': 59}),
+          ('date', {'W': 'Fr', 'D': 24}),
+          ('temp', {'T': 21, 'R': 45}),
+          ('clock', {'H': 0, 'M': 0, 'S': 0}))
+
+_FRAME_MS = 10
+
+# LED gaps, LEDs off, LEDs on
+_PALETTE = ((0x00, 0x00, 0x00), (0x30, 0x0c, 0x08), (0xff, 0x30, 0x20), (0xff, 0xff, 0xff))
+
+
+def _install():
+    # the clock's modules on the simulated hardware, once
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import sim
+    from sim import clock
+    if clock.current is None:
+        sim.install()
+
+
+def play(moves, motion=None):
+    # FrameRecorder holding the frames of moves
+    _install()
+    from config import Settings
+    if motion is not None:
+        Settings.wheel_motion = motion
+    from display import DisplayHandler
+    from recorder import FrameRecorder
+
+    modules = getattr(Settings, 'display_modules', 4)
+    rows = getattr(Settings, 'display_rows', 1)
+    recorder = FrameRecorder(modules, rows, max_frames=100000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        hdisp = DisplayHandler(modules, rows, disp=recorder)
+        hdisp.alarm_enabled = True
+        for mode, values in moves:
+            hdisp.wheels_move_to(hdisp.chars_of(mode, values), show_alarm_enabled=True, show_time_sync_failed=False)
+        hdisp.flush()
+    return recorder
+
+
+def parse_times(times):
+    moves = []
+    for text in times:
+        values = [int(part) for part in text.split(':')]
+        moves.append(('clock', dict(zip('HMS', values + [0] * (3 - len(values))))))
+    return moves
+
+
+def bits(frame, width, height):
+    # rows of 0/1 of a MONO_HLSB frame
+    stride = width // 8
+    return [[frame[y * stride + x // 8] >> (7 - x % 8) & 1 for x in range(0, width)] for y in range(0, height)]
+
+
+def ascii_frame(frame, width, height):
+    return [''.join('#' if bit else '.' for bit in row) for row in bits(frame, width, height)]
+
+
+def image(frame, width, height, scale):
+    # rows of palette indexes, each LED scale pixels with a gap below and right of it
+    out = []
+    for row in bits(frame, width, height):
+        line = bytearray()
+        for bit in row:
+            line += bytes([1 + bit]) * (scale - 1 if scale > 1 else 1)
+            if scale > 1:
+                line.append(0)
+        out += [bytes(line)] * (scale - 1 if scale > 1 else 1)
+        if scale > 1:
+            out.append(bytes(len(line)))
+    return out
+
+
+def lzw(pixels, min_size):
+    # GIF variant of LZW, variable code size up to 12 bits
+    clear = 1 << min_size
+    out = bytearray()
+    acc = 0
+    acc_bits = 0
+
+    def emit(code, size):
+        nonlocal acc, acc_bits
+        acc |= code << acc_bits
+        acc_bits += size
+        while acc_bits >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            acc_bits -= 8
+
+    size = min_size + 1
+    table = {}
+    next_code = clear + 2
+    emit(clear, size)
+    code = pixels[0]
+    for pixel in pixels[1:]:
+        key = (code, pixel)
+        if key in table:
+            code = table[key]
+            continue
+        emit(code, size)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << size:
+                size += 1
+        else:
+            emit(clear, size)
+            table = {}
+            next_code = clear + 2
+            size = min_size + 1
+        code = pixel
+    emit(code, size)
+    if next_code == 1 << size and size < 12:
+        size += 1
+    emit(clear + 1, size)
+    if acc_bits:
+        out.append(acc)
+    return bytes(out)
+
+
+def write_gif(path, width, height, frames, scale, step):
+    # frames in steps of step, frames showing the same add up their time
+    images = []
+    for n in range(0, len(frames), step):
+        pixels = b''.join(image(frames[n], width, height, scale))
+        if images and images[-1][0] == pixels:
+            images[-1][1] += step
+        else:
+            images.append([pixels, step])
+
+    w = len(image(frames[0], width, height, scale)[0])
+    h = len(pixels) // w
+    out = bytearray(b'GIF89a' + struct.pack('<HHBBB', w, h, 0x81, 0, 0))
+    for rgb in _PALETTE:
+        out += bytes(rgb)
+    out += b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'  # loop forever
+    for pixels, count in images:
+        out += b'!\xf9\x04\x00' + struct.pack('<H', max(count * _FRAME_MS // 10, 2)) + b'\x00\x00'
+        out += b',' + struct.pack('<HHHHB', 0, 0, w, h, 0) + b'\x02'
+        data = lzw(pixels, 2)
+        for start in range(0, len(data), 255):
+            block = data[start:start + 255]
+            out += bytes([len(block)]) + block
+        out += b'\x00'
+    out += b';'
+    with open(path, 'wb') as f:
+        f.write(out)
+    return len(images)
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def write_png(path, width, height, frames, scale):
+    rows = []
+    for frame in frames:
+        rows += image(frame, width, height, scale)
+        rows.append(bytes(len(rows[-1])))  # a line between the frames
+    raw = b''.join(b'\x00' + row for row in rows)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', len(rows[0]), len(rows), 8, 3, 0, 0, 0)))
+        f.write(_png_chunk(b'PLTE', b''.join(bytes(rgb) for rgb in _PALETTE)))
+        f.write(_png_chunk(b'IDAT', zlib.compress(raw, 9)))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+def load(path):
+    # (width, height, list of frames)
+    _install()
+    from recorder import load as load_recording
+    width, height, data = load_recording(path)
+    size = width * height // 8
+    return width, height, [data[n:n + size] for n in range(0, len(data), size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='frames', description='Record, check and export display frames.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help in (('record', 'record the frames of the moves'),
+                       ('check', 'compare the frames of the moves with a recording')):
+        command = commands.add_parser(name, help=help)
+        if name == 'record':
+            command.add_argument('recording', help='recording file, e.g. before.mcf')
+        else:
+            command.add_argument('recording', nargs='?', default=GOLDEN,
+                                 help='recording file (default: tools/golden.mcf)')
+        command.add_argument('--time', action='append', default=[], metavar='HH:MM[:SS]',
+                             help='move the clock wheels to this time, repeatable (default: a few clock, date '
+                                  'and temperature moves)')
+        command.add_argument('--motion', help="wheel_motion instead of the one in config.py, e.g. 'ease'")
+    command = commands.add_parser('gif', help='write an animated GIF of a recording')
+    command.add_argument('recording')
+    command.add_argument('output')
+    command.add_argument('--scale', type=int, default=6, help='pixels per LED (default: 6)')
+    command.add_argument('--step', type=int, default=2,
+                         help='frames per GIF frame (default: 2, viewers slow down GIF frames below 20 ms)')
+    command = commands.add_parser('png', help='write frames of a recording below each other')
+    command.add_argument('recording')
+    command.add_argument('output')
+    command.add_argument('--scale', type=int, default=4, help='pixels per LED (default: 4)')
+    command.add_argument('--every', type=int, default=1, help='every nth frame (default: 1)')
+    args = parser.parse_args(argv)
+
+    if args.command in ('record', 'check'):
+        moves = parse_times(args.time) if args.time else _MOVES
+        recorder = play(moves, args.motion)
+        if args.command == 'record':
+            recorder.save(args.recording)
+            print(str(recorder.count) + " frames recorded")
+            return
+        n = recorder.compare(args.recording)
+        if n is None:
+            print(str(recorder.count) + " frames match")
+            return
+        width, height, frames = load(args.recording)
+        print("frame " + str(n) + " differs (" + str(recorder.count) + " frames, recorded " + str(len(frames)) + ")")
+        if n < min(recorder.count, len(frames)):
+            for now, before in zip(ascii_frame(recorder.frame(n), width, height), ascii_frame(frames[n], width, height)):
+                print(now + "  " + before)
+            print("now" + " " * (width - 1) + "recorded")
+        sys.exit(1)
+
+    width, height, frames = load(args.recording)
+    if args.command == 'gif':
+        count = write_gif(args.output, width, height, frames, args.scale, args.step)
+        print(str(len(frames)) + " frames, " + str(count) + " GIF frames")
+    else:
+        frames = frames[::args.every]
+        write_png(args.output, width, height, frames, args.scale)
+        print(str(len(frames)) + " frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import network
+import time
+
+from config import Settings
+import stats
+
+
+class WlanHandler:
+
+    # Keeps one WLAN session for all time syncs.
+    #
+    # open() starts connecting without waiting, connected() is polled until the
+    # association is up. An existing association is reused. After the first
+    # connection the address configuration (static or the DHCP lease) and the
+    # channel of the access point are cached, so the next association after the
+    # radio was switched off skips DHCP and scans one channel only. The BSSID is
+    # cached as well where config('bssid') knows it (not on rp2). close()
+    # switches the radio off unless Settings.wifi_power_save is False.
+
+    def __init__(self):
+        self._wlan = network.WLAN(network.STA_IF)
+
+        try:
+            self.power_save = Settings.wifi_power_save
+        except AttributeError:
+            self.power_save = True
+
+        if Settings.network_use_dhcp:
+            self._ifconfig = None
+        else:
+            self._ifconfig = (Settings.network_ipaddress,
+                Settings.network_subnetmask,
+                Settings.network_gateway,
+                Settings.network_dnsserver)
+        self._bssid = None
+        self._channel = None
+        self._hints = True  # False if connect() of the port takes no bssid or channel
+        self._dhcp_reset = False  # True while the interface still has the dropped lease as static address
+
+        self._open_ticks_ms = None  # when connecting started, None once connected
+        self._on_ticks_ms = None  # when the radio was switched on
+        self.connect_ms = 0  # latency of the last new association
+        self.radio_on_ms = 0  # radio-on time of the last session
+
+    def open(self):
+        self._open_ticks_ms = time.ticks_ms()
+        if not self._wlan.active():
+            self._wlan.active(True)
+            self._on_ticks_ms = self._open_ticks_ms
+        elif self._on_ticks_ms is None:
+            self._on_ticks_ms = self._open_ticks_ms
+        if self._dhcp_reset:
+            self._reset()
+        if self._wlan.isconnected():
+            print("WLAN: reusing connection")
+            self._open_ticks_ms = None
+            return
+
+        if self._ifconfig is not None:
+            self._wlan.ifconfig(self._ifconfig)
+        hints = {}
+        if self._hints:
+            if self._bssid is not None:
+                hints['bssid'] = self._bssid
+            if self._channel is not None:
+                hints['channel'] = self._channel
+        if hints:
+            print("WLAN: reconnecting to " + (self.bssid_str if self._bssid is not None else Settings.wifi_ssid) +
+                  ", channel " + str(self._channel) + "...")
+            try:
+                self._wlan.connect(Settings.wifi_ssid, Settings.wifi_password, **hints)
+                return
+            except TypeError:
+                self._hints = False
+        print("WLAN: connecting...")
+        self._wlan.connect(Settings.wifi_ssid, Settings.wifi_password)
+
+    def connected(self):
+        if not self._wlan.isconnected():
+            return False
+        if self._open_ticks_ms is not None:
+            self.connect_ms = time.ticks_diff(time.ticks_ms(), self._open_ticks_ms)
+            self._open_ticks_ms = None
+            self._ifconfig = self._wlan.ifconfig()
+            self._bssid = self._config('bssid')
+            self._channel = self._config('channel')
+            print("WLAN: connected in " + str(self.connect_ms) + " ms, ifconfig=", self._ifconfig)
+            if __debug__:
+                stats.wlan_connect_ms.add(self.connect_ms)
+        return True
+
+    def _config(self, param):
+        # None if the port can't tell, the reconnect goes without it
+        try:
+            return self._wlan.config(param)
+        except (ValueError, OSError):
+            return None
+
+    def close(self):
+        self._open_ticks_ms = None
+        if not self.power_save or self._on_ticks_ms is None:
+            return
+        self._wlan.disconnect()
+        self._wlan.active(False)
+        self.radio_on_ms = time.ticks_diff(time.ticks_ms(), self._on_ticks_ms)
+        self._on_ticks_ms = None
+        print("WLAN: radio off after " + str(self.radio_on_ms) + " ms")
+        if __debug__:
+            stats.wlan_radio_on_ms.add(self.radio_on_ms)
+
+    def forget(self):
+        # Drops the cached access point and DHCP lease after a failed sync attempt
+        self._bssid = None
+        self._channel = None
+        self.forget_lease()
+
+    def forget_lease(self):
+        # The next connection asks DHCP again, the lease may have run out or been
+        # given to another device meanwhile, e.g. after a few days without a sync
+        if Settings.network_use_dhcp and self._ifconfig is not None:
+            self._ifconfig = None
+            self._dhcp_reset = True
+            if self._wlan.active():
+                self._reset()
+
+    def _reset(self):
+        # a static ifconfig() switches DHCP off until the interface is reset,
+        # this also ends the association
+        self._wlan.active(False)
+        self._wlan.active(True)
+        self._dhcp_reset = False
+
+    def status(self):
+        return self._wlan.status()
+
+    def get_bssid_str(self):
+        return ':'.join('%02x' % b for b in self._bssid)
+
+    bssid_str = property(get_bssid_str)